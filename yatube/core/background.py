@@ -0,0 +1,102 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+_pending = 0
+_keys = set()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                thread_name_prefix='yatube-background',
+            )
+        return _executor
+
+
+def _call(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась ошибкой', func)
+
+
+def _track():
+    """Записать глубину очереди процесса; вызывается под ``_lock``."""
+    if not settings.METRICS_FILE:
+        return
+    try:
+        metrics.set_gauge('yatube_background_queue_depth', _pending)
+    except Exception:
+        logger.exception('Не удалось записать глубину очереди')
+
+
+def _memory_database():
+    """Открыта ли SQLite в памяти, как в тестах.
+
+    Такая база общая для потоков процесса, и запись из фонового потока
+    натыкается на блокировку таблиц: задачи выполняются сразу.
+    """
+    return any(
+        connection.vendor == 'sqlite' and connection.is_in_memory_db()
+        for connection in connections.all()
+    )
+
+
+def runs_inline():
+    """Выполняются ли задачи сразу в вызывающем потоке."""
+    return not settings.BACKGROUND_WORKERS or _memory_database()
+
+
+def _run(key, func, args, kwargs):
+    global _pending
+    try:
+        _call(func, args, kwargs)
+    finally:
+        with _lock:
+            _pending -= 1
+            _keys.discard(key)
+            _track()
+        connections.close_all()
+
+
+def _enqueue(key, func, args, kwargs):
+    global _pending
+    with _lock:
+        if key is not None and key in _keys:
+            return
+        inline = runs_inline()
+        if not inline:
+            _pending += 1
+            _keys.add(key)
+            _track()
+    if inline:
+        _call(func, args, kwargs)
+        return
+    _get_executor().submit(_run, key, func, args, kwargs)
+
+
+def submit(func, *args, key=None, **kwargs):
+    """Выполнить задачу в пуле потоков после фиксации транзакции.
+
+    Задача с ``key``, уже стоящим в очереди, повторно не ставится.
+    При ``BACKGROUND_WORKERS = 0`` задачи выполняются сразу в текущем
+    потоке, что удобно для отладки.
+    """
+    transaction.on_commit(lambda: _enqueue(key, func, args, kwargs))
+
+
+def queue_depth():
+    return _pending
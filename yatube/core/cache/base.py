@@ -0,0 +1,38 @@
+import pickle
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+class TTLPolicyMixin:
+    """Время жизни записей по префиксу ключа.
+
+    ``OPTIONS['TTL_POLICIES']`` сопоставляет префиксам ключей таймауты
+    (``None`` — бессрочно). Политика с самым длинным подходящим
+    префиксом заменяет таймаут, переданный вызывающим кодом.
+    """
+
+    def __init__(self, params):
+        options = dict(params.get('OPTIONS', {}))
+        policies = options.pop('TTL_POLICIES', {})
+        super().__init__({**params, 'OPTIONS': options})
+        self.ttl_policies = sorted(
+            policies.items(), key=lambda item: len(item[0]), reverse=True
+        )
+
+    def policy_timeout(self, key, timeout=DEFAULT_TIMEOUT):
+        for prefix, policy in self.ttl_policies:
+            if key.startswith(prefix):
+                return policy
+        return timeout
+
+
+def dumps(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value).encode()
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def loads(data):
+    if data[:1] == b'\x80':
+        return pickle.loads(data)
+    return int(data)
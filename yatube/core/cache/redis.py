@@ -0,0 +1,221 @@
+import os
+import socket
+import threading
+from urllib.parse import urlparse
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+from .base import TTLPolicyMixin, dumps, loads
+
+
+class RespError(Exception):
+    pass
+
+
+# INCRBY создаёт отсутствующий ключ, а incr кеша Django должен
+# отказывать; проверка и увеличение выполняются на сервере атомарно.
+INCR_SCRIPT = (
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('INCRBY', KEYS[1], ARGV[1]) end "
+    "return false"
+)
+
+
+class RespConnection:
+    """Минимальный клиент протокола Redis (RESP2) без зависимостей.
+
+    Поддерживает конвейер: команды отправляются одним пакетом,
+    ответы читаются по порядку. Ошибка одной команды поднимается только
+    после чтения всех ответов, чтобы соединение осталось согласованным.
+    """
+
+    def __init__(self, host, port, db=0, timeout=None):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.file = self.sock.makefile('rb')
+        if db:
+            self.execute('SELECT', db)
+
+    @staticmethod
+    def _encode(command):
+        parts = [b'*%d\r\n' % len(command)]
+        for arg in command:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError('Соединение с Redis закрыто')
+        prefix, rest = line[:1], line[1:-2]
+        if prefix == b'+':
+            return rest.decode()
+        if prefix == b'-':
+            return RespError(rest.decode())
+        if prefix == b':':
+            return int(rest)
+        if prefix == b'$':
+            length = int(rest)
+            if length == -1:
+                return None
+            return self.file.read(length + 2)[:-2]
+        if prefix == b'*':
+            length = int(rest)
+            if length == -1:
+                return None
+            return [self._read() for _ in range(length)]
+        raise ConnectionError(f'Неизвестный ответ Redis: {line!r}')
+
+    def pipeline(self, *commands):
+        self.sock.sendall(b''.join(map(self._encode, commands)))
+        replies = [self._read() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def execute(self, *command):
+        return self.pipeline(command)[0]
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+class RedisCache(TTLPolicyMixin, BaseCache):
+    """Кеш поверх сервера с протоколом Redis.
+
+    ``LOCATION`` — ``redis://host:port/db``. Подойдёт любой сервер,
+    понимающий команды GET, MGET, SET, DEL, EXISTS, EVAL, PEXPIRE,
+    PERSIST и FLUSHDB.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        url = urlparse(location)
+        self.host = url.hostname or '127.0.0.1'
+        self.port = url.port or 6379
+        self.db = int(url.path.lstrip('/') or 0)
+        self.socket_timeout = params.get('OPTIONS', {}).get(
+            'SOCKET_TIMEOUT', 1
+        )
+        self._local = threading.local()
+
+    def _connection(self):
+        pid, connection = getattr(self._local, 'state', (None, None))
+        if pid != os.getpid():
+            connection = RespConnection(
+                self.host, self.port, self.db, self.socket_timeout
+            )
+            self._local.state = (os.getpid(), connection)
+        return connection
+
+    def _pipeline(self, *commands, retry=True):
+        """Выполнить команды, переподключившись при обрыве.
+
+        Повторяются только команды, которые можно выполнить дважды:
+        если обрыв случился после того, как сервер выполнил увеличение
+        счётчика, повтор увеличил бы его ещё раз. Для остальных
+        ``retry=False`` — соединение сбрасывается, ошибка поднимается.
+        """
+        try:
+            return self._connection().pipeline(*commands)
+        except (ConnectionError, OSError):
+            self._local.state = (None, None)
+            if not retry:
+                raise
+            return self._connection().pipeline(*commands)
+
+    def _ttl(self, key, timeout):
+        timeout = self.policy_timeout(key, timeout)
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return int(timeout * 1000)
+
+    def _set_command(self, made, value, ttl, only_new=False):
+        command = ['SET', made, dumps(value)]
+        if ttl is not None:
+            command += ['PX', ttl]
+        if only_new:
+            command.append('NX')
+        return command
+
+    def get(self, key, default=None, version=None):
+        made = self.make_key(key, version=version)
+        self.validate_key(made)
+        value = self._pipeline(['GET', made])[0]
+        return default if value is None else loads(value)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        if not made:
+            return {}
+        values = self._pipeline(['MGET', *made])[0]
+        return {
+            made[key]: loads(value)
+            for key, value in zip(made, values) if value is not None
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        commands = []
+        for key, value in data.items():
+            made = self.make_key(key, version=version)
+            self.validate_key(made)
+            ttl = self._ttl(key, timeout)
+            if ttl is not None and ttl <= 0:
+                commands.append(['DEL', made])
+            else:
+                commands.append(self._set_command(made, value, ttl))
+        if commands:
+            self._pipeline(*commands)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made = self.make_key(key, version=version)
+        self.validate_key(made)
+        ttl = self._ttl(key, timeout)
+        if ttl is not None and ttl <= 0:
+            return False
+        command = self._set_command(made, value, ttl, only_new=True)
+        return self._pipeline(command, retry=False)[0] is not None
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        made = self.make_key(key, version=version)
+        ttl = self._ttl(key, timeout)
+        if ttl is None:
+            return bool(self._pipeline(['PERSIST', made], ['EXISTS', made])[1])
+        return bool(self._pipeline(['PEXPIRE', made, max(ttl, 1)])[0])
+
+    def incr(self, key, delta=1, version=None):
+        made = self.make_key(key, version=version)
+        self.validate_key(made)
+        value = self._pipeline(
+            ['EVAL', INCR_SCRIPT, 1, made, delta], retry=False
+        )[0]
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        made = [self.make_key(key, version=version) for key in keys]
+        if made:
+            self._pipeline(['DEL', *made])
+
+    def has_key(self, key, version=None):
+        made = self.make_key(key, version=version)
+        return bool(self._pipeline(['EXISTS', made])[0])
+
+    def clear(self):
+        self._pipeline(['FLUSHDB'])
+
+    def close(self, **kwargs):
+        pass
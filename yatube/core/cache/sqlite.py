@@ -0,0 +1,195 @@
+import os
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+from .base import TTLPolicyMixin, dumps, loads
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+CULL_EVERY = 100
+
+
+class SQLiteCache(TTLPolicyMixin, BaseCache):
+    """Кеш в файле SQLite, общий для всех процессов на одной машине.
+
+    ``LOCATION`` — путь к файлу базы. Подходит для локальной работы
+    и тестов там, где нужен настоящий разделяемый кеш без сервера.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        pid, connection = getattr(self._local, 'state', (None, None))
+        if pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.state = (os.getpid(), connection)
+        return connection
+
+    def _expiry(self, key, timeout):
+        return self.get_backend_timeout(self.policy_timeout(key, timeout))
+
+    def _select(self, keys):
+        placeholders = ','.join('?' * len(keys))
+        rows = self._db.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) '
+            'AND (expires IS NULL OR expires > ?)',
+            [*keys, time.time()],
+        )
+        return {key: loads(value) for key, value in rows}
+
+    def get(self, key, default=None, version=None):
+        made = self.make_key(key, version=version)
+        self.validate_key(made)
+        return self._select([made]).get(made, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        if not made:
+            return {}
+        for key in made:
+            self.validate_key(key)
+        return {
+            made[key]: value for key, value in self._select(list(made)).items()
+        }
+
+    def _write(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        expired = [key for key, _, expires in rows
+                   if expires is not None and expires <= time.time()]
+        self._db.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            [row for row in rows if row[0] not in expired],
+        )
+        if expired:
+            self._delete(expired)
+        self._writes += len(rows)
+        if self._writes >= CULL_EVERY:
+            self._writes = 0
+            self._cull()
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made = self.make_key(key, version=version)
+        self.validate_key(made)
+        self._write([(made, dumps(value), self._expiry(key, timeout))])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = []
+        for key, value in data.items():
+            made = self.make_key(key, version=version)
+            self.validate_key(made)
+            rows.append((made, dumps(value), self._expiry(key, timeout)))
+        self._write(rows)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made = self.make_key(key, version=version)
+        self.validate_key(made)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (made, time.time()),
+            )
+            cursor = db.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (made, dumps(value), self._expiry(key, timeout)),
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        made = self.make_key(key, version=version)
+        self.validate_key(made)
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._expiry(key, timeout), made, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        made = self.make_key(key, version=version)
+        self.validate_key(made)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (made, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (dumps(value), made),
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return value
+
+    def _delete(self, keys):
+        placeholders = ','.join('?' * len(keys))
+        return self._db.execute(
+            f'DELETE FROM cache WHERE key IN ({placeholders})', keys
+        ).rowcount
+
+    def delete(self, key, version=None):
+        made = self.make_key(key, version=version)
+        self.validate_key(made)
+        self._delete([made])
+
+    def delete_many(self, keys, version=None):
+        made = [self.make_key(key, version=version) for key in keys]
+        if made:
+            self._delete(made)
+
+    def has_key(self, key, version=None):
+        made = self.make_key(key, version=version)
+        self.validate_key(made)
+        return made in self._select([made])
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _cull(self):
+        db = self._db
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries and self._cull_frequency:
+            db.execute(
+                'DELETE FROM cache WHERE rowid IN ('
+                'SELECT rowid FROM cache ORDER BY rowid LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+    def close(self, **kwargs):
+        pass
@@ -0,0 +1,183 @@
+import os
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.functional import cached_property
+
+FLUSH = '*'
+MISSING = object()
+
+
+class InvalidationBus:
+    """Шина инвалидаций поверх разделяемого кеша.
+
+    Каждое событие получает номер из общего счётчика и хранится
+    отдельным ключом. Процессы периодически сверяют счётчик и вычитывают
+    пропущенные события одним ``get_many``; если отстали больше чем на
+    окно, сбрасывают локальный кеш целиком.
+    """
+
+    SEQUENCE = 'bus:sequence'
+
+    def __init__(self, cache, window=1000, ttl=300):
+        self.cache = cache
+        self.window = window
+        self.ttl = ttl
+
+    @staticmethod
+    def event_key(number):
+        return f'bus:event:{number}'
+
+    def sequence(self):
+        return self.cache.get(self.SEQUENCE, 0)
+
+    def publish(self, events):
+        events = list(events)
+        try:
+            last = self.cache.incr(self.SEQUENCE, len(events))
+        except ValueError:
+            self.cache.add(self.SEQUENCE, 0, None)
+            last = self.cache.incr(self.SEQUENCE, len(events))
+        first = last - len(events) + 1
+        self.cache.set_many(
+            {
+                self.event_key(number): event
+                for number, event in enumerate(events, start=first)
+            },
+            self.ttl,
+        )
+
+    def poll(self, seen):
+        """Вернуть новый номер и события после ``seen``.
+
+        ``None`` вместо списка событий означает, что часть событий
+        потеряна (или разделяемый кеш очищен) и локальные данные нужно
+        сбросить.
+        """
+        current = self.sequence()
+        if current == seen:
+            return current, []
+        if current < seen or current - seen > self.window:
+            return current, None
+        keys = [self.event_key(n) for n in range(seen + 1, current + 1)]
+        return current, list(self.cache.get_many(keys).values())
+
+
+class TieredCache(BaseCache):
+    """Локальный кеш процесса перед разделяемым кешем.
+
+    Чтения обслуживаются из памяти процесса не дольше
+    ``LOCAL_TIMEOUT`` секунд, записи уходят в разделяемый кеш
+    (``OPTIONS['SHARED']`` — его псевдоним в ``CACHES``) и публикуются
+    в шину, по которой соседние процессы удаляют свои копии.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', location)
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.poll_interval = options.get('BUS_POLL_INTERVAL', 1)
+        local_location = options.get(
+            'LOCAL_LOCATION', f'tiered-{self.shared_alias}'
+        )
+        self.local = LocMemCache(local_location, {
+            'TIMEOUT': self.local_timeout,
+            'OPTIONS': {
+                'MAX_ENTRIES': options.get('LOCAL_MAX_ENTRIES', 1000),
+            },
+        })
+        self._state = (None, 0, 0.0)
+
+    @cached_property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    @cached_property
+    def bus(self):
+        return InvalidationBus(self.shared)
+
+    def _sync(self):
+        pid, seen, polled = self._state
+        now = time.monotonic()
+        if pid == os.getpid() and now - polled < self.poll_interval:
+            return
+        if pid != os.getpid():
+            self.local.clear()
+            self._state = (os.getpid(), self.bus.sequence(), now)
+            return
+        current, events = self.bus.poll(seen)
+        self._state = (pid, current, now)
+        if events is None or (FLUSH, None) in events:
+            self.local.clear()
+            return
+        for key, version in events:
+            self.local.delete(key, version=version)
+
+    def _forget(self, keys, version):
+        for key in keys:
+            self.local.delete(key, version=version)
+        self.bus.publish((key, version) for key in keys)
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        value = self.local.get(key, MISSING, version=version)
+        if value is MISSING:
+            value = self.shared.get(key, MISSING, version=version)
+            if value is MISSING:
+                return default
+            self.local.set(key, value, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = self.local.get_many(keys, version=version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            fetched = self.shared.get_many(missing, version=version)
+            self.local.set_many(fetched, version=version)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._forget([key], version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        self._forget(list(data), version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._forget([key], version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self._forget([key], version)
+        return value
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version=version)
+        self._forget([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        if keys:
+            self.shared.delete_many(keys, version=version)
+            self._forget(keys, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version=version) is not MISSING
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+        self.bus.publish([(FLUSH, None)])
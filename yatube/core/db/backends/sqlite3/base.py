@@ -0,0 +1,116 @@
+import logging
+import random
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+from core import metrics, timing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+}
+
+
+def is_busy(error):
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def report_lock_wait(waited, retries):
+    """Учесть ожидание блокировки в замерах запроса и общих метриках."""
+    current = timing.current()
+    if current is not None:
+        current.durations['db-lock'] += waited
+    if not settings.METRICS_FILE:
+        return
+    try:
+        metrics.increment('yatube_db_lock_wait_seconds_total', waited)
+        metrics.increment('yatube_db_busy_retries_total', retries)
+    except Exception:
+        logger.exception('Не удалось записать ожидание блокировки')
+
+
+class RetryingCursorWrapper(base.SQLiteCursorWrapper):
+    """Курсор, повторяющий запрос при занятой базе.
+
+    SQLite отвечает «database is locked», когда ``busy_timeout`` истёк,
+    а другой процесс всё ещё держит блокировку записи. Запрос в этом
+    случае ничего не изменил, и его можно повторить после паузы,
+    растущей вдвое с каждой попыткой. Ожидание учитывается и тогда,
+    когда повторы не помогли.
+    """
+
+    retries = 0
+    backoff = 0.05
+
+    def execute(self, query, params=None):
+        return self._retry(super().execute, query, params)
+
+    def executemany(self, query, param_list):
+        return self._retry(super().executemany, query, list(param_list))
+
+    def _retry(self, method, *args):
+        waited, retried = 0.0, 0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    return method(*args)
+                except sqlite3.OperationalError as error:
+                    if not is_busy(error):
+                        raise
+                    waited += time.perf_counter() - started
+                    if retried == self.retries:
+                        raise
+                pause = self.backoff * 2 ** retried * random.uniform(0.5, 1.5)
+                time.sleep(pause)
+                waited += pause
+                retried += 1
+        finally:
+            if waited:
+                report_lock_wait(waited, retried)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite с профилем PRAGMA, режимом транзакций и повтором запросов.
+
+    Дополнительные ключи ``OPTIONS``: ``pragmas`` — PRAGMA, выполняемые
+    при подключении поверх ``DEFAULT_PRAGMAS``; ``transaction_mode`` —
+    ``DEFERRED``, ``IMMEDIATE`` или ``EXCLUSIVE`` для ``BEGIN``
+    транзакций ``atomic``; ``busy_retries`` и ``busy_backoff`` —
+    число повторов и начальная пауза в секундах. Соединения живут
+    ``CONN_MAX_AGE`` секунд, по одному на поток.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **params.pop('pragmas', {})}
+        self.transaction_mode = params.pop('transaction_mode', '')
+        self.busy_retries = params.pop('busy_retries', 0)
+        self.busy_backoff = params.pop(
+            'busy_backoff', RetryingCursorWrapper.backoff
+        )
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            if not name.isidentifier():
+                raise ValueError(f'Некорректное имя PRAGMA: {name}')
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=RetryingCursorWrapper)
+        cursor.retries = self.busy_retries
+        cursor.backoff = self.busy_backoff
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}'.strip())
@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик из YATUBE_REPLICAS '
+        'для проверки чтения из реплик на локальной машине.'
+    )
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('Реплики не настроены (YATUBE_REPLICAS).')
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Команда поддерживает только SQLite.')
+        primary.ensure_connection()
+        for alias in settings.REPLICA_DATABASES:
+            connections[alias].close()
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: скопирована')
+        self.stdout.write(self.style.SUCCESS('Реплики обновлены'))
@@ -0,0 +1,305 @@
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from django.conf import settings
+
+NAME_SIZE = 120
+# Имя освобождённого слота: поиск проходит его дальше, запись занимает.
+TOMBSTONE = b'\x7f'
+VALUES = 16
+SLOT = struct.Struct(f'{NAME_SIZE}s{VALUES}d')
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+HISTOGRAMS = {
+    'yatube_request_duration_seconds': (
+        LATENCY_BUCKETS, 'Время ответа по представлениям, секунды.'
+    ),
+    'yatube_db_queries': (
+        QUERY_BUCKETS, 'Число SQL-запросов на ответ по представлениям.'
+    ),
+}
+COUNTERS = {
+    'yatube_cache_requests_total': 'Обращения к кешу по представлениям.',
+    'yatube_db_lock_wait_seconds_total': (
+        'Время ожидания блокировки SQLite, секунды.'
+    ),
+    'yatube_db_busy_retries_total': (
+        'Повторы запросов к SQLite из-за занятой базы.'
+    ),
+}
+GAUGES = {
+    'yatube_background_queue_depth': (
+        'Задачи в фоновой очереди (миниатюры изображений).'
+    ),
+}
+
+
+class SharedStore:
+    """Таблица числовых рядов в общем для процессов mmap-файле.
+
+    Каждый ряд занимает слот фиксированного размера: имя и до
+    ``VALUES`` чисел. Слот ищется по хешу имени с линейным
+    пробированием; запись и чтение защищены ``flock``, так что воркеры
+    gunicorn видят общие суммы без отдельного сервиса. Удалённые ряды
+    оставляют метку, которую занимают новые.
+    """
+
+    def __init__(self, path, slots=1024):
+        self.path = path
+        self.slots = slots
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _map(self):
+        if self._pid != os.getpid():
+            size = SLOT.size * self.slots
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._fd = fd
+            self._mmap = mmap.mmap(fd, size)
+            self._pid = os.getpid()
+        return self._mmap
+
+    def _find(self, buffer, name, create):
+        encoded = name.encode()[:NAME_SIZE]
+        start = zlib.crc32(encoded) % self.slots
+        free = []
+        for step in range(self.slots):
+            offset = (start + step) % self.slots * SLOT.size
+            stored = buffer[offset:offset + NAME_SIZE].rstrip(b'\0')
+            if stored == encoded:
+                return offset
+            if stored == TOMBSTONE or not stored:
+                free.append(offset)
+            if not stored:
+                break
+        if not create:
+            return None
+        if not free:
+            raise RuntimeError('Таблица метрик заполнена')
+        SLOT.pack_into(buffer, free[0], encoded, *[0.0] * VALUES)
+        return free[0]
+
+    def _update(self, name, change):
+        with self._lock:
+            buffer = self._map()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset = self._find(buffer, name, create=True)
+                for index, value in change.items():
+                    position = offset + NAME_SIZE + index * 8
+                    struct.pack_into('d', buffer, position, value(
+                        *struct.unpack_from('d', buffer, position)
+                    ))
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def add(self, name, deltas):
+        """Прибавить ``deltas`` (индекс → приращение) к ряду ``name``."""
+        self._update(name, {
+            index: lambda value, delta=delta: value + delta
+            for index, delta in deltas.items()
+        })
+
+    def set(self, name, values):
+        """Записать ``values`` (индекс → значение) в ряд ``name``."""
+        self._update(name, {
+            index: lambda _, value=value: value
+            for index, value in values.items()
+        })
+
+    def discard(self, *names):
+        with self._lock:
+            buffer = self._map()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                for name in names:
+                    offset = self._find(buffer, name, create=False)
+                    if offset is not None:
+                        SLOT.pack_into(
+                            buffer, offset, TOMBSTONE, *[0.0] * VALUES
+                        )
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def items(self):
+        with self._lock:
+            buffer = self._map()
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+            try:
+                rows = [
+                    SLOT.unpack_from(buffer, slot * SLOT.size)
+                    for slot in range(self.slots)
+                ]
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return [
+            (name.rstrip(b'\0').decode(), values)
+            for name, *values in rows
+            if name.rstrip(b'\0') not in (b'', TOMBSTONE)
+        ]
+
+
+_store = None
+_store_pid = None
+
+
+def store():
+    """Таблица метрик; новый процесс сначала забывает завершившиеся."""
+    global _store, _store_pid
+    if _store is None or _store.path != settings.METRICS_FILE:
+        _store = SharedStore(settings.METRICS_FILE)
+        _store_pid = None
+    if _store_pid != os.getpid():
+        _store_pid = os.getpid()
+        _discard_dead(_store)
+    return _store
+
+
+def _series(metric, **labels):
+    return '|'.join(
+        [metric] + [f'{key}={value}' for key, value in sorted(labels.items())]
+    )
+
+
+def observe(metric, value, **labels):
+    buckets, _ = HISTOGRAMS[metric]
+    deltas = {len(buckets): value, len(buckets) + 1: 1}
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            deltas[index] = 1
+            break
+    store().add(_series(metric, **labels), deltas)
+
+
+def increment(metric, amount=1, **labels):
+    store().add(_series(metric, **labels), {0: amount})
+
+
+def set_gauge(metric, value, **labels):
+    """Значение показателя текущего процесса.
+
+    Процессы пишут свои ряды с меткой ``pid``; при выводе живые
+    складываются. Ряды завершившихся процессов удаляются при выводе и
+    при запуске нового процесса.
+    """
+    store().set(_series(metric, pid=os.getpid(), **labels), {0: value})
+
+
+def _alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+def _pid(name):
+    for label in name.split('|')[1:]:
+        key, _, value = label.partition('=')
+        if key == 'pid':
+            return value
+    return None
+
+
+def _discard_dead(shared):
+    """Удалить ряды завершившихся процессов, чтобы не занимали слоты."""
+    dead = [
+        name for name, _ in shared.items()
+        if _pid(name) is not None and not _alive(_pid(name))
+    ]
+    if dead:
+        shared.discard(*dead)
+
+
+def _gauge_series(rows):
+    """Сложить ряды показателей процессов, забыв завершившиеся."""
+    totals, dead = {}, []
+    for name, pairs, values in rows:
+        labels = dict(pairs)
+        if not _alive(labels.pop('pid', os.getpid())):
+            dead.append(name)
+            continue
+        key = tuple(sorted(labels.items()))
+        totals[key] = totals.get(key, 0.0) + values[0]
+    if dead:
+        store().discard(*dead)
+    return [(pairs, [value]) for pairs, value in totals.items()]
+
+
+def observe_request(view, metrics, duration):
+    view = view or 'unresolved'
+    observe('yatube_request_duration_seconds', duration, view=view)
+    observe('yatube_db_queries', metrics.queries, view=view)
+    for result, amount in (
+        ('hit', metrics.cache_hits), ('miss', metrics.cache_misses)
+    ):
+        if amount:
+            increment(
+                'yatube_cache_requests_total', amount,
+                view=view, result=result,
+            )
+
+
+def _number(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _labels(pairs, **extra):
+    pairs = dict(pairs, **extra)
+    if not pairs:
+        return ''
+    inner = ','.join(
+        f'{key}="{value}"' for key, value in sorted(pairs.items())
+    )
+    return '{' + inner + '}'
+
+
+def render():
+    """Все ряды в текстовом формате Prometheus."""
+    series, gauges = {}, {}
+    for name, values in store().items():
+        metric, *labels = name.split('|')
+        pairs = tuple(tuple(label.split('=', 1)) for label in labels)
+        if metric in GAUGES:
+            gauges.setdefault(metric, []).append((name, pairs, values))
+        else:
+            series.setdefault(metric, []).append((pairs, values))
+    for metric, rows in gauges.items():
+        series[metric] = _gauge_series(rows)
+    lines = []
+    for metric, (buckets, help_text) in HISTOGRAMS.items():
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} histogram')
+        for pairs, values in sorted(series.get(metric, [])):
+            cumulative = 0
+            for index, bound in enumerate(buckets):
+                cumulative += values[index]
+                lines.append(
+                    f'{metric}_bucket{_labels(pairs, le=bound)} '
+                    f'{_number(cumulative)}'
+                )
+            total, count = values[len(buckets)], values[len(buckets) + 1]
+            lines.append(
+                f'{metric}_bucket{_labels(pairs, le="+Inf")} {_number(count)}'
+            )
+            lines.append(f'{metric}_sum{_labels(pairs)} {_number(total)}')
+            lines.append(f'{metric}_count{_labels(pairs)} {_number(count)}')
+    for kind, metrics in (('counter', COUNTERS), ('gauge', GAUGES)):
+        for metric, help_text in metrics.items():
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} {kind}')
+            for pairs, values in sorted(series.get(metric, [])):
+                lines.append(f'{metric}{_labels(pairs)} {_number(values[0])}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,163 @@
+import json
+import logging
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from . import metrics as shared_metrics
+from . import replicas, timing
+
+logger = logging.getLogger('yatube.timing')
+
+QUERIES_PARAM = 'timing-queries'
+
+TEMPLATES_IN_HEADER = 5
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def server_timing(metrics, total, full=True):
+    """Значение ``Server-Timing``; шаблоны и этапы — только с ``full``."""
+    entries = [
+        f'db;dur={_ms(metrics.sql_time)};desc="{metrics.queries} queries"',
+        f'cache;desc="{metrics.cache_hits} hits, '
+        f'{metrics.cache_misses} misses"',
+    ]
+    if full:
+        templates = sorted(
+            metrics.templates.items(), key=lambda item: item[1],
+            reverse=True,
+        )
+        for number, (name, duration) in enumerate(
+            templates[:TEMPLATES_IN_HEADER]
+        ):
+            entries.append(
+                f'tpl{number};dur={_ms(duration)};desc="{name}"'
+            )
+        for name, duration in sorted(metrics.durations.items()):
+            entries.append(f'{name};dur={_ms(duration)}')
+    entries.append(f'total;dur={_ms(total)}')
+    return ', '.join(entries)
+
+
+def is_trusted(request):
+    """Запрос сотрудника или с адреса из ``INTERNAL_IPS``."""
+    if request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS:
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_staff)
+
+
+def resolver_match(request):
+    """Разбор URL запроса, даже если ответ отдан до него."""
+    if request.resolver_match is not None:
+        return request.resolver_match
+    try:
+        return resolve(request.path_info)
+    except Resolver404:
+        return None
+
+
+def view_name(request):
+    match = resolver_match(request)
+    return match.view_name if match is not None else None
+
+
+class ServerTimingMiddleware:
+    """Замеры запроса в заголовке ``Server-Timing``, журнале и метриках.
+
+    Время, число запросов к БД и обращения к кешу каждого ответа идут в
+    общие гистограммы ``/metrics``. Подробные замеры (шаблоны,
+    миниатюры, заголовок и строка журнала) делаются для доли запросов
+    ``SERVER_TIMING_SAMPLE_RATE``. Параметр ``?timing-queries=1``
+    включает их всегда и записывает в журнал полный список SQL-запросов.
+
+    Имена шаблонов в заголовке и список запросов в журнале получают
+    только сотрудники и адреса из ``INTERNAL_IPS``; остальным
+    заголовок отдаётся без подробностей. Пользователь известен лишь
+    после ответа, поэтому параметр от внешнего адреса включает замеры,
+    но их подробности отбрасываются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        timing.install()
+
+    def __call__(self, request):
+        collect_queries = request.GET.get(QUERIES_PARAM) == '1'
+        detailed = collect_queries or (
+            random.random() < settings.SERVER_TIMING_SAMPLE_RATE
+        )
+        metrics = timing.RequestMetrics(detailed, collect_queries)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            stack.enter_context(timing.collect(metrics))
+            response = self.get_response(request)
+        total = metrics.elapsed
+        if settings.METRICS_FILE:
+            try:
+                shared_metrics.observe_request(
+                    view_name(request), metrics, total
+                )
+            except Exception:
+                logger.exception('Не удалось записать метрики запроса')
+        if detailed:
+            trusted = is_trusted(request)
+            response['Server-Timing'] = server_timing(
+                metrics, total, full=trusted
+            )
+            self.log(request, response, metrics, total, trusted)
+        return response
+
+    def log(self, request, response, metrics, total, trusted):
+        record = {
+            'path': request.path,
+            'view': view_name(request),
+            'status': response.status_code,
+            'total_ms': _ms(total),
+            'queries': metrics.queries,
+            'sql_ms': _ms(metrics.sql_time),
+            'templates_ms': {
+                name: _ms(duration)
+                for name, duration in metrics.templates.items()
+            },
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+        }
+        record.update(
+            (f'{name}_ms', _ms(duration))
+            for name, duration in metrics.durations.items()
+        )
+        if metrics.query_log is not None and trusted:
+            record['query_log'] = metrics.query_log
+        logger.info(json.dumps(record, ensure_ascii=False))
+
+
+class ReplicaPinMiddleware:
+    """Привязать посетителя к основной базе после его записи.
+
+    Если запрос что-то записал, ответ ставит cookie на
+    ``REPLICA_PIN_SECONDS``: пока она жива, чтения идут мимо реплик и
+    посетитель видит собственные изменения, даже если реплики отстают.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = replicas.PIN_COOKIE in request.COOKIES
+        with replicas.request_state(pinned) as state:
+            response = self.get_response(request)
+        if state.wrote and settings.REPLICA_DATABASES:
+            response.set_cookie(
+                replicas.PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,267 @@
+import json
+from collections.abc import Sequence
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+FORWARD = 'f'
+BACKWARD = 'b'
+
+ESTIMATE_LIMIT = 1000
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def encode_cursor(direction, number, values):
+    values = [
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in values
+    ]
+    payload = json.dumps([direction, number, values], separators=(',', ':'))
+    return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, number, values = json.loads(urlsafe_b64decode(padded))
+    except (BinasciiError, ValueError, TypeError):
+        raise InvalidCursor('Некорректный курсор')
+    if (
+        direction not in (FORWARD, BACKWARD)
+        or type(number) is not int
+        or not isinstance(values, list)
+    ):
+        raise InvalidCursor('Некорректный курсор')
+    return direction, number, values
+
+
+class KeysetWindow(Sequence):
+    """Строки страницы, выбираемые лениво одним запросом.
+
+    Запрос берёт на одну строку больше размера страницы: по ней
+    определяется, есть ли записи дальше по направлению обхода.
+    Объект служит ``object_list`` обычной ``Page`` и доступен шаблонам
+    как ``page_obj.keyset``.
+    """
+
+    def __init__(self, queryset, number, paginator, direction=FORWARD,
+                 from_cursor=False, from_end=False, size=None):
+        self.queryset = queryset
+        self.size = size or paginator.per_page
+        self.number = number
+        self.paginator = paginator
+        self.direction = direction
+        self.from_cursor = from_cursor
+        self.from_end = from_end
+
+    @cached_property
+    def _rows(self):
+        rows = list(self.queryset[:self.size + 1])
+        more = len(rows) > self.size
+        rows = rows[:self.size]
+        if self.direction == BACKWARD:
+            rows.reverse()
+        return rows, more
+
+    def __getitem__(self, index):
+        return self._rows[0][index]
+
+    def __len__(self):
+        return len(self._rows[0])
+
+    def has_next(self):
+        if self.direction == BACKWARD:
+            return not self.from_end
+        return self._rows[1]
+
+    def has_previous(self):
+        if self.direction == BACKWARD:
+            return self._rows[1]
+        return self.from_cursor or self.number > 1
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor(
+            FORWARD,
+            self.number + 1,
+            self.paginator.cursor_values(self[-1]),
+        )
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return encode_cursor(
+            BACKWARD,
+            max(self.number - 1, 1),
+            self.paginator.cursor_values(self[0]),
+        )
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по составному ключу сортировки.
+
+    Переход по курсору выбирает строки условием
+    ``(pub_date, id) < (последняя дата, последний id)`` вместо OFFSET,
+    поэтому время выдачи не зависит от глубины страницы, а новые записи
+    не сдвигают уже открытую ленту. Номера страниц (``?page=``)
+    поддерживаются для совместимости с шаблоном пагинатора.
+
+    С ``estimated=True`` число записей без ``count`` не считается
+    полностью: подсчёт останавливается на ``ESTIMATE_LIMIT``, и номера
+    последних страниц считаются приблизительными.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id'),
+                 count=None, estimated=False, **kwargs):
+        self.ordering = tuple(ordering)
+        self.count_provider = count
+        self.estimated = estimated
+        super().__init__(
+            object_list.order_by(*self.ordering), per_page, **kwargs
+        )
+
+    @cached_property
+    def count(self):
+        if self.count_provider is not None:
+            return self.count_provider()
+        if self.estimated:
+            return self.object_list.order_by()[:ESTIMATE_LIMIT].count()
+        return super().count
+
+    @property
+    def is_estimate(self):
+        return (
+            self.estimated and self.count_provider is None
+            and self.count >= ESTIMATE_LIMIT
+        )
+
+    @property
+    def last_cursor(self):
+        """Курсор последней страницы: обратный обход с конца ленты."""
+        return encode_cursor(BACKWARD, self.num_pages, [])
+
+    @cached_property
+    def _keys(self):
+        model = self.object_list.model
+        annotations = self.object_list.query.annotations
+        keys = []
+        for item in self.ordering:
+            name = item.lstrip('-')
+            if name in annotations:
+                field = annotations[name].output_field
+            else:
+                field = _resolve(model, name)
+            keys.append((name, item.startswith('-'), field))
+        return keys
+
+    def cursor_values(self, obj):
+        values = []
+        for name, _, _ in self._keys:
+            value = obj
+            for attr in name.split('__'):
+                value = getattr(value, attr)
+            values.append(value)
+        return values
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:], number, self)
+
+    def _get_page(self, queryset, number, paginator, **kwargs):
+        keyset = KeysetWindow(queryset, number, paginator, **kwargs)
+        page = Page(keyset, number, paginator)
+        page.keyset = keyset
+        return page
+
+    def cursor_page(self, cursor):
+        direction, number, raw_values = decode_cursor(cursor)
+        if direction == BACKWARD and not raw_values:
+            return self._end_page(number)
+        if len(raw_values) != len(self._keys):
+            raise InvalidCursor('Некорректный курсор')
+        try:
+            values = [
+                field.to_python(value)
+                for (_, _, field), value in zip(self._keys, raw_values)
+            ]
+        except (ValidationError, TypeError, ValueError, OverflowError):
+            raise InvalidCursor('Некорректный курсор')
+        queryset = self.object_list.filter(
+            self._seek(values, backward=direction == BACKWARD)
+        )
+        if direction == BACKWARD:
+            queryset = queryset.reverse()
+        return self._get_page(
+            queryset, max(number, 1), self,
+            direction=direction, from_cursor=True,
+        )
+
+    def _end_page(self, number):
+        number = max(number, 1)
+        size = None
+        if not self.is_estimate:
+            size = self.count - (self.num_pages - 1) * self.per_page
+        return self._get_page(
+            self.object_list.reverse(), number, self,
+            direction=BACKWARD, from_cursor=True, from_end=True, size=size,
+        )
+
+    def get_cursor_page(self, cursor):
+        try:
+            return self.cursor_page(cursor)
+        except InvalidCursor:
+            return self.page(1)
+
+    def _seek(self, values, backward=False):
+        condition = Q()
+        for index, (name, descending, _) in enumerate(self._keys):
+            lookup = 'gt' if descending == backward else 'lt'
+            branch = Q(**{f'{name}__{lookup}': values[index]})
+            for (prev_name, _, _), value in zip(self._keys, values[:index]):
+                branch &= Q(**{prev_name: value})
+            condition |= branch
+        return condition
+
+
+def page_window(number, num_pages, neighbours=2):
+    """Номера страниц вокруг текущей с первой и последней.
+
+    Пропуски обозначены ``None``; соседние номера не заменяются
+    многоточием.
+    """
+    numbers = {1, num_pages, *range(number - neighbours,
+                                    number + neighbours + 1)}
+    window = []
+    for page in sorted(n for n in numbers if 1 <= n <= num_pages):
+        if window and page - window[-1] == 2:
+            window.append(page - 1)
+        elif window and page - window[-1] > 2:
+            window.append(None)
+        window.append(page)
+    return window
+
+
+def _resolve(model, path):
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        if name in ('pk', 'id'):
+            return model._meta.pk
+        raise
@@ -0,0 +1,222 @@
+import hashlib
+import logging
+import re
+import time
+from functools import lru_cache, partial, wraps
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import EmptyResultSet
+from django.db import transaction
+from django.db.models.sql.compiler import (
+    SQLCompiler, SQLDeleteCompiler, SQLUpdateCompiler,
+)
+from django.db.models.sql.constants import MULTI, SINGLE
+
+WRITE = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE'
+    r'|DELETE\s+FROM)\s+["`]?(\w+)',
+    re.IGNORECASE,
+)
+IDENTIFIER = re.compile(r'["`](\w+)["`]')
+
+logger = logging.getLogger(__name__)
+
+
+def table_key(table):
+    return f'version:table:{table}'
+
+
+@lru_cache(maxsize=None)
+def model_tables():
+    return frozenset(
+        model._meta.db_table
+        for model in apps.get_models(include_auto_created=True)
+    )
+
+
+def _stamp():
+    return time.time_ns() // 1000
+
+
+def bump(*tables):
+    stamp = _stamp()
+    cache.set_many({table_key(table): stamp for table in tables}, None)
+
+
+class CachedQuerySetMixin:
+    """Опция ``.cached()`` для кеширования результатов запроса."""
+
+    def cached(self, timeout=None):
+        clone = self._chain()
+        clone.query.cache_timeout = (
+            settings.QUERY_CACHE_TIMEOUT if timeout is None else timeout
+        )
+        return clone
+
+
+def _timeout(compiler):
+    timeout = getattr(compiler.query, 'cache_timeout', None)
+    model = compiler.query.model
+    if timeout is None and model is not None and (
+        model._meta.label in settings.QUERY_CACHE_MODELS
+    ):
+        timeout = settings.QUERY_CACHE_TIMEOUT
+    return timeout
+
+
+def _cacheable(compiler, result_type, chunked_fetch):
+    return not (
+        result_type not in (MULTI, SINGLE)
+        or chunked_fetch
+        or compiler.query.select_for_update
+        or isinstance(compiler, (SQLDeleteCompiler, SQLUpdateCompiler))
+    )
+
+
+def _tables(sql):
+    return sorted(set(IDENTIFIER.findall(sql)) & model_tables())
+
+
+def _entry_key(compiler, result_type, sql, params):
+    raw = f'{compiler.using}\n{result_type}\n{sql}\n{params!r}'
+    return 'query:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def dirty_tables(connection):
+    """Таблицы, изменённые в ещё не зафиксированной транзакции.
+
+    Это отложенные до фиксации вызовы ``bump``: при откате Django
+    отбрасывает их вместе с пометкой.
+    """
+    return {
+        callback.args[0] for _, callback in connection.run_on_commit
+        if isinstance(callback, partial) and callback.func is bump
+    }
+
+
+def _lookup(key, version_keys):
+    """Запись кеша и текущие версии таблиц одним ``get_many``."""
+    found = cache.get_many([key, *version_keys])
+    entry = found.pop(key, None)
+    missing = {
+        version: _stamp() for version in version_keys
+        if version not in found
+    }
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return entry, found
+
+
+def _may_lag(alias, stamps):
+    """Реплика может ещё не видеть недавнюю запись в таблицы запроса."""
+    if alias not in settings.REPLICA_DATABASES:
+        return False
+    window = settings.REPLICA_PIN_SECONDS * 1_000_000
+    return max(stamps.values()) > _stamp() - window
+
+
+def _cached_execute_sql(execute_sql):
+    @wraps(execute_sql)
+    def wrapper(self, result_type=MULTI, chunked_fetch=False, *args,
+                **kwargs):
+        timeout = _timeout(self)
+        if not timeout or not _cacheable(self, result_type, chunked_fetch):
+            return execute_sql(
+                self, result_type, chunked_fetch, *args, **kwargs
+            )
+        try:
+            sql, params = self.as_sql()
+        except EmptyResultSet:
+            sql = None
+        tables = _tables(sql) if sql else []
+        if not tables or not dirty_tables(self.connection).isdisjoint(
+            tables
+        ):
+            return execute_sql(
+                self, result_type, chunked_fetch, *args, **kwargs
+            )
+        key = _entry_key(self, result_type, sql, params)
+        version_keys = [table_key(table) for table in tables]
+        entry, found = _lookup(key, version_keys)
+        if entry is not None and entry[0] == found:
+            return entry[1]
+        # SQL уже собран: повторная сборка в execute_sql не нужна.
+        self.as_sql = lambda *args, **kwargs: (sql, params)
+        try:
+            result = execute_sql(
+                self, result_type, chunked_fetch, *args, **kwargs
+            )
+        finally:
+            del self.as_sql
+        if result_type == MULTI:
+            result = [[row for chunk in result for row in chunk]]
+        if not _may_lag(self.connection.alias, found):
+            cache.set(key, (found, result), timeout)
+        return result
+    wrapper.cached = True
+    return wrapper
+
+
+def invalidate(execute, sql, params, many, context):
+    """Обёртка соединения: запись в таблицу меняет её версию.
+
+    Внутри транзакции таблица только помечается изменённой: до фиксации
+    её запросы на этом соединении идут мимо кеша, а версия меняется
+    после фиксации.
+    """
+    result = execute(sql, params, many, context)
+    match = WRITE.match(sql)
+    if match and match.group(1) in model_tables():
+        table = match.group(1)
+        connection = context['connection']
+        if not connection.in_atomic_block:
+            bump(table)
+        elif table not in dirty_tables(connection):
+            transaction.on_commit(
+                partial(bump, table), using=connection.alias
+            )
+    return result
+
+
+def connection_created(sender, connection, **kwargs):
+    if invalidate not in connection.execute_wrappers:
+        connection.execute_wrappers.append(invalidate)
+
+
+def is_shared(backend):
+    """Видят ли записи кеша все процессы сервера."""
+    return not isinstance(backend, (LocMemCache, DummyCache))
+
+
+def enabled():
+    """Можно ли включать кеш запросов.
+
+    Версии таблиц в памяти одного процесса не доходят до соседних
+    воркеров, и те отдавали бы устаревшие строки, поэтому нужен общий
+    кеш или явное ``QUERY_CACHE_ALLOW_LOCAL`` для одного процесса.
+    """
+    return is_shared(caches['default']) or settings.QUERY_CACHE_ALLOW_LOCAL
+
+
+def install():
+    """Подключить кеш результатов к компилятору SQL-запросов.
+
+    Кешируются только запросы с ``.cached()`` или к моделям из
+    ``QUERY_CACHE_MODELS``: строки, как их вернула БД, под ключом из
+    текста запроса и параметров. Запись хранит версии всех таблиц
+    запроса и годится, пока они не изменились.
+    """
+    if not enabled():
+        logger.warning(
+            'Кеш запросов выключен: кеш по умолчанию не общий для '
+            'процессов. Настройте YATUBE_CACHE или '
+            'QUERY_CACHE_ALLOW_LOCAL.'
+        )
+        return
+    if not getattr(SQLCompiler.execute_sql, 'cached', False):
+        SQLCompiler.execute_sql = _cached_execute_sql(SQLCompiler.execute_sql)
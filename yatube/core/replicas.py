@@ -0,0 +1,94 @@
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+PIN_COOKIE = 'replica_pin'
+
+_state = threading.local()
+
+
+class RequestState:
+    """Где читать данные в рамках одного запроса."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica_reads = False
+        self.wrote = False
+
+    @property
+    def use_replica(self):
+        return self.replica_reads and not (self.pinned or self.wrote)
+
+
+def current():
+    return getattr(_state, 'request', None)
+
+
+@contextmanager
+def request_state(pinned=False):
+    _state.request = RequestState(pinned)
+    try:
+        yield _state.request
+    finally:
+        _state.request = None
+
+
+def replica_reads(view):
+    """Разрешить представлению читать из реплик.
+
+    Действует только для GET и HEAD и только пока посетитель не
+    привязан к основной базе после своей записи.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = current()
+        if state is None or request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        state.replica_reads = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.replica_reads = False
+    return wrapper
+
+
+class ReplicaRouter:
+    """Чтение из реплик в помеченных представлениях, запись — в основную.
+
+    Любая запись в ходе запроса переводит его чтения на основную базу,
+    а ``ReplicaPinMiddleware`` продлевает эту привязку на
+    ``REPLICA_PIN_SECONDS`` для следующих запросов посетителя.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current()
+        if (
+            not settings.REPLICA_DATABASES
+            or state is None
+            or not state.use_replica
+        ):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        state = current()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.REPLICA_DATABASES}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
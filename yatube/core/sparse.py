@@ -0,0 +1,55 @@
+import numpy as np
+
+
+def csr(rows, cols, size, values=None):
+    """Разреженная матрица по парам ``(rows, cols)`` в виде CSR.
+
+    Возвращает ``indptr`` и ``indices``, а со значениями ``values`` —
+    ещё и их, переставленные так же: соседи строки ``i`` —
+    ``indices[indptr[i]:indptr[i + 1]]``. Хватает numpy, scipy не нужен.
+    """
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+    if values is None:
+        return indptr, cols[order]
+    return indptr, cols[order], values[order]
+
+
+def expand(matrix, rows, weights):
+    """Соседи строк ``rows`` одним проходом, без цикла по строкам.
+
+    Возвращает номер исходного элемента, соседа и вес элемента для
+    каждой пары, умноженный на значение матрицы, если оно есть, —
+    это умножение разреженного вектора на матрицу до суммирования.
+    """
+    indptr, indices, *values = matrix
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    owners = np.repeat(np.arange(len(rows)), lengths)
+    positions = np.repeat(starts, lengths) + np.arange(lengths.sum()) - (
+        np.repeat(np.cumsum(lengths) - lengths, lengths)
+    )
+    weights = weights[owners]
+    if values:
+        weights = weights * values[0][positions]
+    return owners, indices[positions], weights
+
+
+def sum_pairs(rows, cols, weights, size):
+    """Сложить веса одинаковых пар ``(rows, cols)``."""
+    keys, inverse = np.unique(rows * size + cols, return_inverse=True)
+    return keys // size, keys % size, np.bincount(inverse, weights)
+
+
+def best(rows, cols, weights, limit):
+    """Не больше ``limit`` пар с наибольшим весом в каждой строке.
+
+    Пары возвращаются по строкам в порядке убывания веса вместе
+    с местом в строке.
+    """
+    order = np.lexsort((cols, -weights, rows))
+    rows, cols, weights = rows[order], cols[order], weights[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows) + 1
+    top = rank <= limit
+    return rows[top], cols[top], weights[top], rank[top]
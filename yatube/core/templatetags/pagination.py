@@ -0,0 +1,22 @@
+from django import template
+
+from core.paginator import page_window
+
+register = template.Library()
+
+PAGE_NEIGHBOURS = 2
+
+
+@register.inclusion_tag('includes/paginator.html', takes_context=True)
+def page_navigation(context, page_obj, neighbours=PAGE_NEIGHBOURS):
+    paginator = page_obj.paginator
+    return {
+        'page_obj': page_obj,
+        'keyset': page_obj.keyset,
+        'page_query': context.get('page_query', ''),
+        'window': page_window(
+            page_obj.number, paginator.num_pages, neighbours
+        ),
+        'last_cursor': paginator.last_cursor,
+        'estimated': paginator.is_estimate,
+    }
@@ -1,6 +1,34 @@
+import json
+import shutil
+import socketserver
+import sqlite3
+import tempfile
+import threading
+import time
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections, transaction
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+from . import background, metrics, querycache, replicas, timing
+from .db.backends.sqlite3.base import DatabaseWrapper
+from .metrics import SharedStore
+from .paginator import page_window
+from .cache.redis import (
+    INCR_SCRIPT, RedisCache, RespConnection, RespError,
+)
+from .cache.sqlite import SQLiteCache
+from .cache.tiered import TieredCache
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +36,624 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class PageWindowTest(SimpleTestCase):
+    def test_window_keeps_edges_and_neighbours(self):
+        cases = {
+            (1, 1): [1],
+            (1, 10): [1, 2, 3, None, 10],
+            (4, 10): [1, 2, 3, 4, 5, 6, None, 10],
+            (500, 100000): [1, None, 498, 499, 500, 501, 502, None, 100000],
+        }
+        for (number, num_pages), window in cases.items():
+            with self.subTest(number=number, num_pages=num_pages):
+                self.assertEqual(page_window(number, num_pages), window)
+
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    """Заглушка сервера Redis: словарь в памяти и нужные кешу команды."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RespHandler)
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def alive(self, key):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= time.time():
+            self.data.pop(key, None)
+            return None
+        return value
+
+    def run(self, name, *args):
+        command = getattr(self, f'command_{name.lower()}', None)
+        if command is None:
+            return RespError(f'ERR unknown command {name}')
+        return command(*args)
+
+    def command_get(self, key):
+        return self.alive(key)
+
+    def command_mget(self, *keys):
+        return [self.alive(key) for key in keys]
+
+    def command_set(self, key, value, *flags):
+        if b'NX' in flags and self.alive(key) is not None:
+            return None
+        expires = None
+        if b'PX' in flags:
+            ttl = int(flags[flags.index(b'PX') + 1])
+            expires = time.time() + ttl / 1000
+        self.data[key] = (value, expires)
+        return 'OK'
+
+    def command_del(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def command_exists(self, key):
+        return int(self.alive(key) is not None)
+
+    def command_incrby(self, key, delta):
+        current = self.alive(key) or b'0'
+        if not current.lstrip(b'-').isdigit():
+            return RespError('ERR value is not an integer')
+        value = int(current) + int(delta)
+        expires = self.data.get(key, (None, None))[1]
+        self.data[key] = (str(value).encode(), expires)
+        return value
+
+    def command_eval(self, script, count, key, delta):
+        if script.decode() != INCR_SCRIPT:
+            return RespError('ERR unknown script')
+        if self.alive(key) is None:
+            return None
+        return self.command_incrby(key, delta)
+
+    def command_flushdb(self):
+        self.data.clear()
+        return 'OK'
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if isinstance(value, RespError):
+            return b'-%s\r\n' % str(value).encode()
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, str):
+            return b'+%s\r\n' % value.encode()
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, list):
+            return b'*%d\r\n' % len(value) + b''.join(map(self.reply, value))
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        while True:
+            command = self.read_command()
+            if command is None:
+                return
+            with self.server.lock:
+                result = self.server.run(command[0].decode(), *command[1:])
+            self.wfile.write(self.reply(result))
+
+
+class CacheBackendContract:
+    def test_get_set_delete(self):
+        cache = self.cache
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertTrue(cache.has_key('key'))
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+
+    def test_many(self):
+        cache = self.cache
+        cache.set_many({'a': 1, 'b': 'два'})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 'два'})
+        cache.delete_many(['a', 'b'])
+        self.assertEqual(cache.get_many(['a', 'b']), {})
+
+    def test_add_and_incr(self):
+        cache = self.cache
+        self.assertTrue(cache.add('counter', 1))
+        self.assertFalse(cache.add('counter', 5))
+        self.assertEqual(cache.incr('counter', 2), 3)
+        self.assertEqual(cache.get('counter'), 3)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+
+    def test_expiry_and_policies(self):
+        cache = self.cache
+        cache.set('short', 1, timeout=0.05)
+        cache.set('pinned:key', 1, timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('short'))
+        self.assertEqual(cache.get('pinned:key'), 1)
+
+    def test_clear(self):
+        self.cache.set('key', 1)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+
+
+class SQLiteCacheTest(CacheBackendContract, SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = SQLiteCache(f'{self.directory}/cache.sqlite3', {
+            'OPTIONS': {'TTL_POLICIES': {'pinned:': None}},
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class RedisCacheTest(CacheBackendContract, SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = RespStandIn()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        host, port = self.server.server_address
+        self.cache = RedisCache(f'redis://{host}:{port}/0', {
+            'OPTIONS': {'TTL_POLICIES': {'pinned:': None}},
+        })
+        self.cache.clear()
+
+    def test_pipeline_keeps_reply_order(self):
+        host, port = self.server.server_address
+        connection = RespConnection(host, port)
+        replies = connection.pipeline(
+            ['SET', 'x', '1'], ['INCRBY', 'x', 4], ['GET', 'x']
+        )
+        self.assertEqual(replies, ['OK', 5, b'5'])
+        connection.close()
+
+    def test_only_idempotent_commands_are_retried(self):
+        self.cache.set('counter', 1)
+        calls = []
+        pipeline = RespConnection.pipeline
+
+        def dropped(connection, *commands):
+            calls.append(commands)
+            if len(calls) == 1:
+                pipeline(connection, *commands)
+                raise ConnectionError('Соединение оборвано')
+            return pipeline(connection, *commands)
+
+        with mock.patch.object(RespConnection, 'pipeline', dropped):
+            with self.assertRaises(ConnectionError):
+                self.cache.incr('counter')
+            self.assertEqual(len(calls), 1)
+            calls.clear()
+            self.assertEqual(self.cache.get('counter'), 2)
+            self.assertEqual(len(calls), 2)
+
+    def test_pipeline_error_leaves_connection_in_sync(self):
+        host, port = self.server.server_address
+        connection = RespConnection(host, port)
+        with self.assertRaises(RespError):
+            connection.pipeline(
+                ['SET', 'x', 'text'], ['INCRBY', 'x', 1], ['GET', 'y']
+            )
+        self.assertEqual(connection.execute('GET', 'x'), b'text')
+        connection.close()
+
+
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        shared = SQLiteCache(f'{self.directory}/cache.sqlite3', {})
+        self.workers = []
+        for number in range(2):
+            worker = TieredCache('shared', {'OPTIONS': {
+                'LOCAL_LOCATION': f'worker-{number}',
+                'BUS_POLL_INTERVAL': 0,
+                'LOCAL_TIMEOUT': 60,
+            }})
+            worker.shared = shared
+            worker.local.clear()
+            self.workers.append(worker)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_writes_invalidate_sibling_workers(self):
+        first, second = self.workers
+        first.set('key', 'старое')
+        self.assertEqual(second.get('key'), 'старое')
+        first.set('key', 'новое')
+        self.assertEqual(second.get('key'), 'новое')
+        first.delete('key')
+        self.assertIsNone(second.get('key'))
+
+    def test_bus_sequence_outlives_events(self):
+        shared = SQLiteCache(f'{self.directory}/policies.sqlite3', {
+            'OPTIONS': {'TTL_POLICIES': settings.CACHE_TTL_POLICIES},
+        })
+        bus = self.workers[0].bus
+        self.assertIsNone(shared.policy_timeout(bus.SEQUENCE, bus.ttl))
+        self.assertEqual(
+            shared.policy_timeout(bus.event_key(1), None), bus.ttl
+        )
+
+    def test_clear_resets_sibling_workers(self):
+        first, second = self.workers
+        first.set_many({'a': 1, 'b': 2})
+        self.assertEqual(second.get_many(['a', 'b']), {'a': 1, 'b': 2})
+        first.clear()
+        self.assertEqual(second.get_many(['a', 'b']), {})
+
+
+class BackgroundTest(TransactionTestCase):
+    def test_jobs_start_after_commit(self):
+        done = threading.Event()
+        with transaction.atomic():
+            background.submit(done.set)
+            self.assertFalse(done.wait(0.05))
+        self.assertTrue(done.wait(5))
+
+    @override_settings(BACKGROUND_WORKERS=0)
+    def test_inline_mode_runs_immediately(self):
+        calls = []
+        background.submit(calls.append, 1, key='job')
+        background.submit(calls.append, 2, key='job')
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(background.queue_depth(), 0)
+
+
+class QueryCacheTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.user = get_user_model().objects.create_user(username='auth')
+
+    def test_repeated_query_is_served_from_cache(self):
+        Group.objects.get(slug='group')
+        Follow.objects.filter(user=self.user).exists()
+        with self.assertNumQueries(0):
+            group = Group.objects.get(slug='group')
+            following = Follow.objects.filter(user=self.user).exists()
+        self.assertEqual(group, self.group)
+        self.assertFalse(following)
+
+    def test_write_invalidates_table(self):
+        Group.objects.get(slug='group')
+        Group.objects.filter(slug='group').update(title='Новое')
+        with self.assertNumQueries(1):
+            group = Group.objects.get(slug='group')
+        self.assertEqual(group.title, 'Новое')
+
+    def test_transaction_bypasses_dirty_tables(self):
+        self.assertEqual(Group.objects.filter(slug='new').count(), 0)
+        with transaction.atomic():
+            Group.objects.create(title='Новая', slug='new')
+            with self.assertNumQueries(1):
+                self.assertEqual(Group.objects.filter(slug='new').count(), 1)
+        self.assertEqual(Group.objects.filter(slug='new').count(), 1)
+        with self.assertNumQueries(0):
+            Group.objects.filter(slug='new').count()
+
+    def test_rollback_clears_dirty_mark(self):
+        with transaction.atomic():
+            Group.objects.create(title='Новая', slug='new')
+            transaction.set_rollback(True)
+        self.assertNotIn(
+            Group._meta.db_table, querycache.dirty_tables(connection)
+        )
+
+    def test_queryset_opt_in(self):
+        Post.objects.create(author=self.user, text='Пост')
+        list(Post.objects.all())
+        with self.assertNumQueries(1):
+            list(Post.objects.all())
+        list(Post.objects.cached())
+        with self.assertNumQueries(0):
+            posts = list(Post.objects.cached())
+        self.assertEqual(posts[0].text, 'Пост')
+
+    def test_users_are_not_cached_by_default(self):
+        get_user_model().objects.get(username='auth')
+        with self.assertNumQueries(1):
+            get_user_model().objects.get(username='auth')
+
+    def test_process_local_cache_needs_opt_in(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        shared = SQLiteCache(f'{directory}/cache.sqlite3', {})
+        self.assertTrue(querycache.is_shared(shared))
+        with self.settings(QUERY_CACHE_ALLOW_LOCAL=False):
+            self.assertFalse(querycache.enabled())
+
+
+@override_settings(REPLICA_DATABASES=['replica0'])
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+        self.request = RequestFactory().get('/')
+
+    def route(self, request, write=False):
+        @replicas.replica_reads
+        def view(request):
+            if write:
+                self.router.db_for_write(Post)
+            return self.router.db_for_read(Post)
+        return view(request)
+
+    def test_marked_views_read_from_replicas(self):
+        with replicas.request_state():
+            self.assertEqual(self.route(self.request), 'replica0')
+            self.assertIsNone(self.router.db_for_read(Post))
+            self.assertIsNone(self.route(RequestFactory().post('/')))
+
+    def test_writes_and_pins_read_from_primary(self):
+        with replicas.request_state():
+            self.assertIsNone(self.route(self.request, write=True))
+        with replicas.request_state(pinned=True):
+            self.assertIsNone(self.route(self.request))
+
+    def test_write_pins_visitor(self):
+        user = get_user_model().objects.create_user(username='auth')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Пост'}
+        )
+        cookie = response.cookies[replicas.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class SQLiteBackendTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = f'{self.directory}/db.sqlite3'
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def connect(self, **options):
+        settings_dict = dict(connections['default'].settings_dict)
+        settings_dict.update(NAME=self.path, OPTIONS=options)
+        wrapper = DatabaseWrapper(settings_dict)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragma_profile_is_applied(self):
+        wrapper = self.connect(pragmas={'cache_size': -2048})
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -2048)
+
+    def test_busy_database_is_retried(self):
+        wrapper = self.connect(
+            pragmas={'busy_timeout': 0},
+            busy_retries=10,
+            busy_backoff=0.01,
+        )
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (value INTEGER)')
+        blocker = sqlite3.connect(self.path, check_same_thread=False)
+        blocker.execute('BEGIN IMMEDIATE')
+        threading.Timer(0.1, blocker.commit).start()
+        metrics = timing.RequestMetrics()
+        with timing.collect(metrics), wrapper.cursor() as cursor:
+            cursor.execute('INSERT INTO item VALUES (%s)', [1])
+        blocker.close()
+        self.assertGreater(metrics.durations['db-lock'], 0)
+
+    def test_failed_retries_report_lock_wait(self):
+        wrapper = self.connect(
+            pragmas={'busy_timeout': 0},
+            busy_retries=2,
+            busy_backoff=0.01,
+        )
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (value INTEGER)')
+        blocker = sqlite3.connect(self.path)
+        blocker.execute('BEGIN IMMEDIATE')
+        self.addCleanup(blocker.close)
+        metrics = timing.RequestMetrics()
+        with timing.collect(metrics), wrapper.cursor() as cursor:
+            with self.assertRaises(OperationalError):
+                cursor.execute('INSERT INTO item VALUES (%s)', [1])
+        self.assertGreater(metrics.durations['db-lock'], 0.01)
+
+    def test_atomic_blocks_take_write_lock_upfront(self):
+        wrapper = self.connect(transaction_mode='IMMEDIATE')
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (value INTEGER)')
+        wrapper._start_transaction_under_autocommit()
+        other = sqlite3.connect(self.path, timeout=0)
+        with self.assertRaises(sqlite3.OperationalError):
+            other.execute('BEGIN IMMEDIATE')
+        other.close()
+        wrapper.connection.rollback()
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def get_logged(self, url, **params):
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            response = self.client.get(url, params)
+        return response, json.loads(logs.records[0].getMessage())
+
+    @override_settings(INTERNAL_IPS=['127.0.0.1'])
+    def test_request_is_measured(self):
+        response, record = self.get_logged(reverse('posts:index'))
+        header = response['Server-Timing']
+        self.assertIn('db;dur=', header)
+        self.assertIn('desc="includes/post.html"', header)
+        self.assertIn('total;dur=', header)
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertGreater(record['queries'], 0)
+        self.assertIn('includes/post.html', record['templates_ms'])
+        self.assertGreater(record['cache_misses'], 0)
+        self.assertNotIn('query_log', record)
+
+    def test_outside_requests_get_coarse_header(self):
+        response, record = self.get_logged(reverse('posts:index'))
+        header = response['Server-Timing']
+        self.assertIn('db;dur=', header)
+        self.assertIn('total;dur=', header)
+        self.assertNotIn('tpl0', header)
+        self.assertIn('includes/post.html', record['templates_ms'])
+
+    @override_settings(INTERNAL_IPS=['127.0.0.1'])
+    def test_query_list_is_logged_for_internal_requests(self):
+        _, record = self.get_logged(
+            reverse('posts:index'), **{'timing-queries': 1}
+        )
+        self.assertEqual(len(record['query_log']), record['queries'])
+
+    def test_query_list_is_logged_for_staff_only(self):
+        url = reverse('posts:index')
+        _, record = self.get_logged(url, **{'timing-queries': 1})
+        self.assertNotIn('query_log', record)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        _, record = self.get_logged(url, **{'timing-queries': 1})
+        self.assertEqual(len(record['query_log']), record['queries'])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_untouched(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = f'{self.directory}/metrics'
+        cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_workers_share_series(self):
+        first, second = SharedStore(self.path), SharedStore(self.path)
+        first.add('series', {0: 1, 2: 0.5})
+        second.add('series', {0: 2})
+        (name, values), = SharedStore(self.path).items()
+        self.assertEqual(name, 'series')
+        self.assertEqual(values[:3], [3.0, 0.0, 0.5])
+
+    def test_dead_processes_leave_queue_depth(self):
+        with self.settings(METRICS_FILE=self.path):
+            metrics.set_gauge('yatube_background_queue_depth', 2)
+            metrics.store().set(
+                'yatube_background_queue_depth|pid=999999999', {0: 5}
+            )
+            lines = metrics.render().splitlines()
+            self.assertIn('yatube_background_queue_depth 2', lines)
+            self.assertEqual(len(metrics.store().items()), 1)
+            metrics.set_gauge('yatube_background_queue_depth', 0)
+            lines = metrics.render().splitlines()
+        self.assertIn('yatube_background_queue_depth 0', lines)
+
+    def test_discarded_slots_are_reused(self):
+        store = SharedStore(self.path, slots=2)
+        store.add('first', {0: 1})
+        store.add('second', {0: 1})
+        store.discard('first')
+        store.add('third', {0: 3})
+        self.assertEqual(
+            sorted((name, values[0]) for name, values in store.items()),
+            [('second', 1.0), ('third', 3.0)],
+        )
+
+    def test_new_process_forgets_dead_processes(self):
+        SharedStore(self.path).set(
+            'yatube_background_queue_depth|pid=999999999', {0: 5}
+        )
+        with self.settings(METRICS_FILE=self.path):
+            self.assertEqual(metrics.store().items(), [])
+
+    def test_full_table_does_not_break_requests(self):
+        with self.settings(METRICS_FILE=self.path), mock.patch.object(
+            SharedStore, '_find', side_effect=RuntimeError('full')
+        ), self.assertLogs('yatube.timing', 'ERROR'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(INTERNAL_IPS=['127.0.0.1'])
+    def test_endpoint_exports_view_histograms(self):
+        with self.settings(METRICS_FILE=self.path):
+            self.client.get(reverse('posts:index'))
+            self.client.get(reverse('posts:index'))
+            response = self.client.get(reverse('metrics'))
+        lines = response.content.decode().splitlines()
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            lines,
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{le="+Inf",view="posts:index"} 2',
+            lines,
+        )
+        self.assertIn('# TYPE yatube_db_queries histogram', lines)
+        self.assertTrue(any(
+            line.startswith(
+                'yatube_cache_requests_total{result="hit",view="posts:index"}'
+            ) for line in lines
+        ))
+
+    def test_token_protects_endpoint(self):
+        with self.settings(METRICS_FILE=self.path, METRICS_TOKEN='secret'):
+            response = self.client.get(reverse('metrics'))
+            self.assertEqual(response.status_code, 401)
+            response = self.client.get(
+                reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+            )
+            self.assertEqual(response.status_code, 200)
+
+    @override_settings(INTERNAL_IPS=['127.0.0.1'])
+    def test_endpoint_is_off_without_file(self):
+        with self.settings(METRICS_FILE=''):
+            response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_endpoint_is_internal_without_token(self):
+        with self.settings(METRICS_FILE=self.path):
+            response = self.client.get(reverse('metrics'))
+            self.assertEqual(response.status_code, 403)
+            with self.settings(INTERNAL_IPS=['127.0.0.1']):
+                response = self.client.get(reverse('metrics'))
+            self.assertEqual(response.status_code, 200)
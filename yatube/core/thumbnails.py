@@ -0,0 +1,27 @@
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults, settings
+from sorl.thumbnail.images import ImageFile
+
+
+class ThumbnailLookupBackend(ThumbnailBackend):
+    def lookup(self, file_, geometry_string, **options):
+        """Вернуть готовую миниатюру или ``None``, ничего не создавая.
+
+        Параметры дополняются так же, как в ``get_thumbnail``, чтобы
+        имя миниатюры совпало с тем, что создаст фоновая задача.
+        """
+        source = ImageFile(file_)
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+lookup_backend = ThumbnailLookupBackend()
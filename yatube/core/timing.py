@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+from django.core.cache import caches
+from django.template.base import Template
+
+_state = threading.local()
+
+
+class RequestMetrics:
+    """Счётчики времени одного запроса."""
+
+    def __init__(self, detailed=True, collect_queries=False):
+        self.detailed = detailed
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.templates = defaultdict(float)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.durations = defaultdict(float)
+        self.query_log = [] if collect_queries else None
+        self.in_cache_call = False
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += duration
+            if self.query_log is not None:
+                self.query_log.append({
+                    'sql': sql, 'ms': round(duration * 1000, 3),
+                })
+
+
+def current():
+    return getattr(_state, 'metrics', None)
+
+
+@contextmanager
+def collect(metrics):
+    _state.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _state.metrics = None
+
+
+@contextmanager
+def measure(name):
+    """Добавить время блока к метрике ``name`` текущего запроса."""
+    metrics = current()
+    if metrics is None or not metrics.detailed:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.durations[name] += time.perf_counter() - started
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        metrics = current()
+        if metrics is None or not metrics.detailed:
+            return render(self, context)
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            name = self.origin.template_name or self.name or '<string>'
+            metrics.templates[name] += time.perf_counter() - started
+    wrapper.timed = True
+    return wrapper
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, *args, **kwargs):
+        metrics = current()
+        if metrics is None or metrics.in_cache_call:
+            return get(self, key, default, *args, **kwargs)
+        metrics.in_cache_call = True
+        try:
+            value = get(self, key, default, *args, **kwargs)
+        finally:
+            metrics.in_cache_call = False
+        if value is default:
+            metrics.cache_misses += 1
+        else:
+            metrics.cache_hits += 1
+        return value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, *args, **kwargs):
+        metrics = current()
+        if metrics is None or metrics.in_cache_call:
+            return get_many(self, keys, *args, **kwargs)
+        keys = list(keys)
+        metrics.in_cache_call = True
+        try:
+            values = get_many(self, keys, *args, **kwargs)
+        finally:
+            metrics.in_cache_call = False
+        metrics.cache_hits += len(values)
+        metrics.cache_misses += len(keys) - len(values)
+        return values
+    return wrapper
+
+
+def install():
+    """Подключить замеры шаблонов и кеша.
+
+    Пока запрос не измеряется, обёртки сводятся к одной проверке
+    thread-local. Обернуть нужно только класс кеша ``default``:
+    вложенные кеши многоуровневого бэкенда не считаются дважды.
+    """
+    if not getattr(Template.render, 'timed', False):
+        Template.render = _timed_render(Template.render)
+    backend = type(caches['default'])
+    if not getattr(backend, '_timed', False):
+        backend.get = _counted_get(backend.get)
+        backend.get_many = _counted_get_many(backend.get_many)
+        backend._timed = True
@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as shared_metrics
 
 
 def page_not_found(request, exception):
@@ -15,3 +20,25 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def metrics(request):
+    """Метрики Prometheus.
+
+    С ``METRICS_TOKEN`` нужен заголовок ``Authorization: Bearer``, без
+    него метрики отдаются только адресам из ``INTERNAL_IPS``.
+    """
+    if not settings.METRICS_FILE:
+        raise Http404
+    if settings.METRICS_TOKEN:
+        if not constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}',
+        ):
+            return HttpResponse(status=401)
+    elif request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        return HttpResponse(status=403)
+    return HttpResponse(
+        shared_metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = 'includes/post.html'
+
+
+def card_key(post_id):
+    return f'post-card:{post_id}'
+
+
+def render_cards(posts):
+    """Вернуть пары (пост, HTML карточки) для страницы ленты.
+
+    Все карточки страницы читаются из кеша одним ``get_many``;
+    отрисовываются только отсутствующие или устаревшие по ``updated``.
+    """
+    posts = list(posts)
+    cached = cache.get_many([card_key(post.pk) for post in posts])
+    cards = []
+    rendered = {}
+    for post in posts:
+        key = card_key(post.pk)
+        stamp = post.updated.timestamp()
+        entry = cached.get(key)
+        if entry is not None and entry[0] == stamp:
+            html = entry[1]
+        else:
+            html = render_to_string(CARD_TEMPLATE, {'post': post})
+            rendered[key] = (stamp, html)
+        cards.append((post, mark_safe(html)))
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return cards
+
+
+def invalidate(*post_ids):
+    cache.delete_many([card_key(post_id) for post_id in post_ids])
@@ -0,0 +1,100 @@
+from datetime import datetime, timezone
+from hashlib import md5
+
+from django.conf import settings
+from django.views.decorators.http import condition
+
+from . import versions
+from .models import Group, Post, User
+
+
+def viewer(request):
+    """Часть ETag, отличающая варианты страницы для разных читателей.
+
+    Для пользователя учитывается и CSRF-cookie: после его смены
+    сохранённая браузером страница с формой стала бы недействительной.
+    """
+    if not request.user.is_authenticated:
+        return 'anon'
+    token = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return md5(f'{request.user.pk}:{token}'.encode()).hexdigest()
+
+
+def conditional(version_keys):
+    """Декоратор условного GET по версиям ресурсов страницы.
+
+    ``version_keys(request, **kwargs)`` возвращает ключи версий, от
+    которых зависит страница, или ``None``, если ресурса нет. ETag и
+    Last-Modified строятся по самой свежей версии, так что ответ
+    ``304`` отдаётся до выборки постов и отрисовки шаблона. Версии
+    остаются в ``request.surrogate_keys`` для кеша страниц.
+    """
+    def latest(request, *args, **kwargs):
+        if not hasattr(request, 'surrogate_keys'):
+            keys = version_keys(request, **kwargs)
+            request.surrogate_keys = None if keys is None else dict(
+                zip(keys, versions.get_versions(*keys))
+            )
+        if request.surrogate_keys is None:
+            return None
+        return max(request.surrogate_keys.values())
+
+    def etag(request, *args, **kwargs):
+        stamp = latest(request, *args, **kwargs)
+        if stamp is None:
+            return None
+        return f'{stamp}-{viewer(request)}'
+
+    def last_modified(request, *args, **kwargs):
+        stamp = latest(request, *args, **kwargs)
+        if stamp is None:
+            return None
+        return datetime.fromtimestamp(stamp / 10 ** 6, tz=timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def index_keys(request):
+    return [versions.INDEX]
+
+
+def trending_keys(request):
+    return [versions.TRENDING]
+
+
+def group_keys(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return None
+    return [versions.group_key(group_id)]
+
+
+def profile_keys(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    keys = [versions.profile_key(author_id)]
+    if request.user.is_authenticated:
+        keys.append(versions.follow_key(request.user.pk))
+    return keys
+
+
+def post_keys(request, post_id):
+    author_id = Post.objects.filter(pk=post_id).order_by().values_list(
+        'author_id', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    return [versions.post_key(post_id), versions.profile_key(author_id)]
+
+
+def comment_keys(request, post_id):
+    return [versions.post_key(post_id)]
+
+
+def follow_keys(request):
+    return [versions.INDEX, versions.follow_key(request.user.pk)]
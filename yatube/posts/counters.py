@@ -0,0 +1,103 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Counter, Follow, Post
+
+TOTAL_POSTS = 'posts'
+FOLLOWERS = 'followers'
+
+
+def author_posts_key(author_id):
+    return f'posts:author:{author_id}'
+
+
+def group_posts_key(group_id):
+    return f'posts:group:{group_id}'
+
+
+def followers_key(author_id):
+    return f'followers:author:{author_id}'
+
+
+def get_count(key, queryset):
+    """Вернуть сохранённое значение счётчика.
+
+    Отсутствующий счётчик один раз считается по таблице и сохраняется,
+    дальше он поддерживается сигналами без ``COUNT(*)``.
+    """
+    value = Counter.objects.filter(key=key).values_list(
+        'value', flat=True
+    ).first()
+    if value is None:
+        value = Counter.objects.get_or_create(
+            key=key,
+            defaults={'value': queryset.count()},
+        )[0].value
+    return value
+
+
+def change(key, delta):
+    Counter.objects.filter(key=key).update(value=F('value') + delta)
+
+
+def post_count(author=None, group=None):
+    if author is not None:
+        return get_count(author_posts_key(author.pk), author.posts.all())
+    if group is not None:
+        return get_count(group_posts_key(group.pk), group.posts.all())
+    return get_count(TOTAL_POSTS, Post.objects.all())
+
+
+def post_count_provider(**kwargs):
+    return lambda: post_count(**kwargs)
+
+
+def follower_count(author_id):
+    return get_count(
+        followers_key(author_id),
+        Follow.objects.filter(author_id=author_id),
+    )
+
+
+def change_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def reconcile_comments():
+    counts = Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+        'post'
+    ).annotate(num=Count('id')).values('num')
+    return Post.objects.update(
+        comments_count=Coalesce(Subquery(counts), 0)
+    )
+
+
+def reconcile():
+    reconcile_comments()
+    values = {TOTAL_POSTS: Post.objects.count()}
+    per_author = Post.objects.values_list('author').annotate(Count('id'))
+    values.update(
+        (author_posts_key(author_id), num)
+        for author_id, num in per_author.order_by()
+    )
+    per_group = Post.objects.filter(group__isnull=False).values_list(
+        'group'
+    ).annotate(Count('id'))
+    values.update(
+        (group_posts_key(group_id), num)
+        for group_id, num in per_group.order_by()
+    )
+    per_author = Follow.objects.values_list('author').annotate(Count('id'))
+    values.update(
+        (followers_key(author_id), num)
+        for author_id, num in per_author.order_by()
+    )
+    Counter.objects.filter(key__startswith=TOTAL_POSTS).delete()
+    Counter.objects.filter(key__startswith=FOLLOWERS).delete()
+    Counter.objects.bulk_create(
+        (Counter(key=key, value=value) for key, value in values.items()),
+        batch_size=500,
+    )
+    return values
@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.core.cache import cache
+from PIL import features
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+
+from core import background, timing
+from core.thumbnails import lookup_backend
+
+from . import cards, versions
+from .models import Post
+
+FAILURE_TIMEOUT = 60 * 60
+
+FALLBACK_FORMAT = 'JPEG'
+
+
+def failure_key(post_id):
+    return f'thumbnail-failed:{post_id}'
+
+
+def is_failed(post_id):
+    return cache.get(failure_key(post_id)) is not None
+
+
+def image_formats():
+    """Современные форматы из настроек, которые умеют Pillow и sorl."""
+    return [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in EXTENSIONS and features.check(image_format.lower())
+    ]
+
+
+def variants():
+    """Описания вариантов изображения: (формат, ширина, геометрия).
+
+    Первый вариант — основная миниатюра ``POST_THUMBNAIL_GEOMETRY``,
+    по которой определяется готовность; остальные — ширины из
+    ``POST_IMAGE_WIDTHS`` в резервном и современных форматах с теми
+    же пропорциями.
+    """
+    geometry = settings.POST_THUMBNAIL_GEOMETRY
+    width, height = (int(size) for size in geometry.split('x'))
+    result = [(FALLBACK_FORMAT, width, geometry)]
+    for image_format in [FALLBACK_FORMAT] + image_formats():
+        for variant_width in settings.POST_IMAGE_WIDTHS:
+            variant_height = round(variant_width * height / width)
+            variant = (
+                image_format,
+                variant_width,
+                f'{variant_width}x{variant_height}',
+            )
+            if variant not in result:
+                result.append(variant)
+    return result
+
+
+def schedule(post):
+    background.submit(generate, post.pk, key=f'thumbnail:{post.pk}')
+
+
+def _lookup(post, image_format, geometry):
+    return lookup_backend.lookup(
+        post.image.name, geometry,
+        format=image_format, **settings.POST_THUMBNAIL_OPTIONS,
+    )
+
+
+def generate(post_id):
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author', 'group'
+    ).first()
+    if post is None or not post.image:
+        return
+    with timing.measure('thumbnail'):
+        for image_format, _, geometry in variants():
+            get_thumbnail(
+                post.image.name, geometry,
+                format=image_format, **settings.POST_THUMBNAIL_OPTIONS,
+            )
+    image_format, _, geometry = variants()[0]
+    if _lookup(post, image_format, geometry) is None:
+        cache.set(failure_key(post.pk), True, FAILURE_TIMEOUT)
+        return
+    cache.delete(failure_key(post.pk))
+    cards.invalidate(post.pk)
+    versions.bump(
+        versions.post_key(post.pk),
+        *versions.feed_keys(post.author_id, post.group_id),
+    )
+
+
+def picture(post):
+    """Данные для разметки ``<picture>`` изображения поста.
+
+    Шаблоны никогда не создают миниатюры сами: недостающие ставятся в
+    очередь, а до готовности основной миниатюры показывается оригинал.
+    """
+    if not post.image:
+        return None
+    ready = {}
+    missing = False
+    for image_format, width, geometry in variants():
+        try:
+            with timing.measure('thumbnail'):
+                thumbnail = _lookup(post, image_format, geometry)
+        except Exception:
+            thumbnail = None
+        if thumbnail is None:
+            missing = True
+        else:
+            ready.setdefault(image_format, {})[width] = thumbnail.url
+    if missing and not is_failed(post.pk):
+        schedule(post)
+    main_format, main_width, _ = variants()[0]
+    main = ready.get(main_format, {}).get(main_width)
+    if main is None:
+        return {'src': post.image.url, 'srcset': '', 'sources': []}
+    return {
+        'src': main,
+        'srcset': _srcset(ready.pop(FALLBACK_FORMAT)),
+        'sources': [
+            (f'image/{image_format.lower()}', _srcset(urls))
+            for image_format, urls in ready.items()
+        ],
+        'sizes': settings.POST_IMAGE_SIZES,
+    }
+
+
+def _srcset(urls):
+    return ', '.join(f'{url} {width}w' for width, url in sorted(urls.items()))
@@ -0,0 +1,172 @@
+import json
+import math
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import urls as posts_urls
+from posts.models import Follow, Group, Post
+from users import urls as users_urls
+
+DEFAULT_BASELINE = 'bench_baseline.json'
+
+SKIPPED = {
+    'posts:add_comment',
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+    'users:logout',
+    'users:password_reset_confirm',
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def sample_urls():
+    """Адреса представлений ``posts.urls`` и ``users.urls`` на данных БД."""
+    follow = Follow.objects.order_by('id').first()
+    post = Post.objects.order_by('-comments_count', 'id').first()
+    group = Group.objects.order_by('id').first()
+    values = {
+        'slug': group.slug if group else None,
+        'username': post.author.username if post else None,
+        'post_id': post.id if post else None,
+    }
+    reader = follow.user if follow else (post.author if post else None)
+    for module in (posts_urls, users_urls):
+        for pattern in module.urlpatterns:
+            name = f'{module.app_name}:{pattern.name}'
+            params = pattern.pattern.converters
+            kwargs = {key: values.get(key) for key in params}
+            if name in SKIPPED or None in kwargs.values():
+                continue
+            yield name, reverse(name, kwargs=kwargs), reader
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержки (p50/p95/p99), число SQL-запросов и пик памяти '
+        'представлений posts.urls и users.urls и сравнивает их '
+        'с сохранённой базовой линией.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--baseline', default=DEFAULT_BASELINE,
+            help='Файл базовой линии.',
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результаты как новую базовую линию.',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p95 и памяти, доля.',
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, url, user in sample_urls():
+            results[name] = self.measure(url, user, options)
+            self.report(name, results[name])
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовая линия сохранена в {options["baseline"]}'
+            ))
+            return
+        try:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            self.stdout.write('Базовой линии нет, сравнение пропущено.')
+            return
+        regressions = list(self.compare(results, baseline, options))
+        for line in regressions:
+            self.stdout.write(self.style.ERROR(line))
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def request(self, client, url, cold):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+        return elapsed, len(queries)
+
+    def measure(self, url, user, options):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        for _ in range(options['warmup']):
+            self.request(client, url, options['cold'])
+        timings, queries = [], []
+        for _ in range(options['iterations']):
+            elapsed, count = self.request(client, url, options['cold'])
+            timings.append(elapsed * 1000)
+            queries.append(count)
+        tracemalloc.start()
+        try:
+            self.request(client, url, options['cold'])
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            'p50_ms': round(percentile(timings, 0.5), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries': percentile(queries, 0.5),
+            'memory_kib': round(peak / 1024, 1),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:40} p50 {result["p50_ms"]:8.2f} мс  '
+            f'p95 {result["p95_ms"]:8.2f} мс  '
+            f'p99 {result["p99_ms"]:8.2f} мс  '
+            f'запросов {result["queries"]:3}  '
+            f'память {result["memory_kib"]:9.1f} КиБ'
+        )
+
+    def compare(self, results, baseline, options):
+        limit = 1 + options['threshold']
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if result['p95_ms'] > base['p95_ms'] * limit:
+                yield (
+                    f'{name}: p95 {result["p95_ms"]} мс, '
+                    f'было {base["p95_ms"]} мс'
+                )
+            if result['queries'] > base['queries']:
+                yield (
+                    f'{name}: запросов {result["queries"]}, '
+                    f'было {base["queries"]}'
+                )
+            if result['memory_kib'] > base['memory_kib'] * limit:
+                yield (
+                    f'{name}: память {result["memory_kib"]} КиБ, '
+                    f'было {base["memory_kib"]} КиБ'
+                )
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import related
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает словарь и TF-IDF-векторы всех постов и находит '
+        'для каждого похожие посты. Новые и изменённые посты между '
+        'запусками обрабатываются при сохранении; команда запускается '
+        'периодически, например из cron.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        posts, stored = related.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов: {posts}, похожих пар: {stored}, '
+            f'за {time.perf_counter() - started:.2f} с'
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации, кого почитать, по графу подписок: '
+        'для пользователей, чьи подписки изменились после прошлого '
+        'запуска, или для всех с --full. Запускается периодически, '
+        'например из cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать рекомендации всех пользователей.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users, stored = suggestions.refresh(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {users}, '
+            f'рекомендаций: {stored}, '
+            f'за {time.perf_counter() - started:.2f} с'
+        ))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг популярных постов за последние '
+        'TRENDING_WINDOW_DAYS дней. Запускается периодически, например '
+        'из cron.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        scored, stored = trending.compute()
+        self.stdout.write(self.style.SUCCESS(
+            f'Оценено постов: {scored}, в рейтинге: {stored}, '
+            f'за {time.perf_counter() - started:.2f} с'
+        ))
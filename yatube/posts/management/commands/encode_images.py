@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт варианты изображений постов всех ширин и форматов '
+        'для уже загруженных картинок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Удалить готовые варианты и создать их заново.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').order_by('id').values_list(
+            'id', 'image'
+        )
+        encoded = failed = 0
+        for post_id, name in posts.iterator():
+            if options['force']:
+                default.kvstore.delete_thumbnails(ImageFile(name))
+            images.generate(post_id)
+            if images.is_failed(post_id):
+                failed += 1
+                self.stdout.write(self.style.WARNING(
+                    f'  не удалось обработать {name}'
+                ))
+            else:
+                encoded += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {encoded}, с ошибками: {failed}'
+        ))
@@ -0,0 +1,125 @@
+import re
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from posts import views
+from posts.models import Follow, Group, Post
+
+SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)( USING (?:COVERING )?INDEX)?')
+
+LIMIT = re.compile(r'\bLIMIT\b')
+
+# Кэши запросов, фрагментов и карточек отключаются, иначе повторные
+# запросы представлений не доходят до базы и не попадают в отчёт.
+NO_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+
+def sample_requests():
+    post = Post.objects.order_by('id').first()
+    group = Group.objects.order_by('id').first()
+    follow = Follow.objects.order_by('id').first()
+    anonymous = AnonymousUser()
+    yield 'posts:index', views.index, {}, anonymous
+    if group is not None:
+        yield 'posts:group_list', views.group_posts, {'slug': group.slug}, (
+            anonymous
+        )
+    if post is not None:
+        author = post.author
+        yield 'posts:profile', views.profile, {
+            'username': author.username
+        }, anonymous
+        yield 'posts:post_detail', views.post_detail, {
+            'post_id': post.id
+        }, anonymous
+        yield 'posts:post_edit', views.post_edit, {'post_id': post.id}, (
+            author
+        )
+    if follow is not None:
+        yield 'posts:follow_index', views.follow_index, {}, follow.user
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def scans(sql, tables):
+    """Полные просмотры таблиц в плане запроса.
+
+    Обход индекса без условия поиска тоже читает всю таблицу, если
+    запрос не остановлен ``LIMIT``.
+    """
+    for line in explain(sql):
+        match = SCAN.match(line)
+        if not match or match.group(1) not in tables:
+            continue
+        if match.group(2) and LIMIT.search(sql):
+            continue
+        yield match.group(1), bool(match.group(2))
+
+
+def capture(view, request, kwargs):
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as queries:
+            view(request, **kwargs)
+        transaction.set_rollback(True)
+    return [query['sql'] for query in queries]
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет представления posts.views на данных из базы, '
+        'прогоняет их SELECT-запросы через EXPLAIN QUERY PLAN '
+        'и отмечает полные просмотры таблиц и индексов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-scan',
+            action='store_true',
+            help='Завершиться с ошибкой, если найден полный просмотр.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда поддерживает только SQLite.')
+        with override_settings(CACHES=NO_CACHES, QUERY_CACHE_MODELS=()):
+            found = self.explain_views()
+        if found and options['fail_on_scan']:
+            raise CommandError(f'Найдено полных просмотров: {found}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, полных просмотров: {found}'
+        ))
+
+    def explain_views(self):
+        factory = RequestFactory()
+        tables = set(connection.introspection.table_names())
+        found = 0
+        for name, view, kwargs, user in sample_requests():
+            request = factory.get(reverse(name, kwargs=kwargs))
+            request.user = user
+            queries = capture(view, request, kwargs)
+            self.stdout.write(f'{name}: запросов {len(queries)}')
+            for sql in queries:
+                if not sql.startswith('SELECT'):
+                    continue
+                for table, by_index in scans(sql, tables):
+                    found += 1
+                    kind = 'просмотр индекса' if by_index else (
+                        'полный просмотр'
+                    )
+                    self.stdout.write(self.style.WARNING(
+                        f'  {kind} {table}: {sql}'
+                    ))
+        return found
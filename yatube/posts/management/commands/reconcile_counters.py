@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов (всего, по авторам и группам) '
+        'и подписчиков по реальным таблицам одним проходом.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            values = counters.reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано счётчиков: {len(values)}, '
+            f'всего постов: {values[counters.TOTAL_POSTS]}'
+        ))
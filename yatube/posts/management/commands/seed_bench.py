@@ -0,0 +1,229 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from posts import counters, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    'лента пост автор группа подписка кеш запрос индекс страница ответ '
+    'время город море солнце книга музыка кино работа дом друг утро '
+    'вечер зима лето осень весна дорога новость история идея вопрос'
+).split()
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Позволить ``bulk_create`` сохранить заданные даты.
+
+    Поля с ``auto_now_add``/``auto_now`` иначе перезаписывают их
+    текущим временем.
+    """
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def zipf_weights(count, exponent):
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу данными для нагрузочных замеров: пользователи, '
+        'группы, подписки со степенным распределением, посты, горячие '
+        'посты с длинными ветками комментариев и изображения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя.',
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель распределения Ципфа для авторов.',
+        )
+        parser.add_argument('--hot-posts', type=int, default=5)
+        parser.add_argument('--hot-comments', type=int, default=2000)
+        parser.add_argument(
+            '--images', type=int, default=10,
+            help='Число разных картинок для постов.',
+        )
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.2,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+        self.now = timezone.now()
+        with transaction.atomic():
+            users = self.create_users()
+            groups = self.create_groups()
+            self.create_follows(users)
+            images = self.create_images()
+            self.create_posts(users, groups, images)
+            self.create_comments(users)
+            counters.reconcile()
+            timeline.rebuild()
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: пользователей {len(users)}, групп {len(groups)}, '
+            f'постов {Post.objects.count()}, '
+            f'подписок {Follow.objects.count()}, '
+            f'комментариев {Comment.objects.count()}'
+        ))
+
+    def bulk_create(self, model, objects, **kwargs):
+        for batch in batches(objects, self.options['batch_size']):
+            model.objects.bulk_create(batch, **kwargs)
+
+    def create_users(self):
+        prefix = self.options['prefix']
+        password = make_password(None)
+        self.bulk_create(User, (
+            User(username=f'{prefix}{number}', password=password,
+                 first_name='Автор', last_name=str(number))
+            for number in range(self.options['users'])
+        ), ignore_conflicts=True)
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_groups(self):
+        prefix = self.options['prefix']
+        self.bulk_create(Group, (
+            Group(title=f'Группа {number}', slug=f'{prefix}-{number}',
+                  description='Группа для замеров')
+            for number in range(self.options['groups'])
+        ), ignore_conflicts=True)
+        return list(Group.objects.filter(
+            slug__startswith=f'{prefix}-'
+        ).values_list('id', flat=True))
+
+    def create_follows(self, users):
+        weights = zipf_weights(len(users), self.options['skew'])
+        mean = self.options['follows']
+
+        def follows():
+            for user_id in users:
+                size = min(
+                    int(self.random.expovariate(1 / mean)) if mean else 0,
+                    len(users) - 1,
+                )
+                authors = set(self.random.choices(
+                    users, cum_weights=weights, k=size
+                ))
+                authors.discard(user_id)
+                for author_id in authors:
+                    yield Follow(
+                        user_id=user_id,
+                        author_id=author_id,
+                        created=self.random_date(),
+                    )
+
+        with explicit_dates(Follow._meta.get_field('created')):
+            self.bulk_create(Follow, follows(), ignore_conflicts=True)
+
+    def create_images(self):
+        names = []
+        for number in range(self.options['images']):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            buffer = BytesIO()
+            Image.new('RGB', (1600, 900), color).save(buffer, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/{self.options["prefix"]}-{number}.jpg',
+                ContentFile(buffer.getvalue()),
+            ))
+        return names
+
+    def random_date(self):
+        seconds = self.random.uniform(0, self.options['days'] * 86400)
+        return self.now - timedelta(seconds=seconds)
+
+    def random_text(self, words):
+        return ' '.join(self.random.choices(WORDS, k=words)).capitalize()
+
+    def create_posts(self, users, groups, images):
+        weights = zipf_weights(len(users), self.options['skew'])
+        ratio = self.options['image_ratio']
+
+        def posts():
+            for _ in range(self.options['posts']):
+                date = self.random_date()
+                yield Post(
+                    author_id=self.random.choices(
+                        users, cum_weights=weights
+                    )[0],
+                    group_id=(
+                        self.random.choice(groups)
+                        if groups and self.random.random() < 0.7 else None
+                    ),
+                    text=self.random_text(self.random.randint(5, 60)),
+                    image=(
+                        self.random.choice(images)
+                        if images and self.random.random() < ratio else ''
+                    ),
+                    pub_date=date,
+                    updated=date,
+                )
+
+        fields = [
+            Post._meta.get_field(name) for name in ('pub_date', 'updated')
+        ]
+        with explicit_dates(*fields):
+            self.bulk_create(Post, posts())
+
+    def create_comments(self, users):
+        hot = Post.objects.order_by('-pub_date').values_list(
+            'id', 'pub_date'
+        )[:self.options['hot_posts']]
+
+        def comments():
+            for post_id, date in hot:
+                for number in range(self.options['hot_comments']):
+                    yield Comment(
+                        post_id=post_id,
+                        author_id=self.random.choice(users),
+                        text=self.random_text(self.random.randint(3, 20)),
+                        created=date + timedelta(seconds=number),
+                    )
+
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.bulk_create(Comment, comments())
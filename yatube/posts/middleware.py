@@ -0,0 +1,85 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import parse_http_date_safe
+
+from core.middleware import resolver_match
+from . import pageviews
+from .versions import surrogate_names
+
+COUNTED_VIEW = 'posts:post_detail'
+
+
+def page_key(request):
+    uri = request.build_absolute_uri()
+    return f'page:{md5(uri.encode()).hexdigest()}'
+
+
+class AnonymousPageCacheMiddleware:
+    """Кеш целых страниц для читателей без сессии.
+
+    Стоит до ``SessionMiddleware``, поэтому попадание обходится без
+    загрузки сессии, CSRF и отрисовки. Страница кешируется, если
+    представление сообщило версии, от которых зависит
+    (``request.surrogate_keys``), и считается устаревшей, как только
+    любая из них изменилась. Заголовок ``Surrogate-Key`` называет те же
+    версии, чтобы внешний прокси мог очищать страницы по ним; хранить
+    их дольше (``Surrogate-Control``) прокси разрешено, только если
+    задан ``PAGE_CACHE_PURGE_URL`` и смена версий до него доходит.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method != 'GET' or (
+            settings.SESSION_COOKIE_NAME in request.COOKIES
+        ):
+            return self.get_response(request)
+        key = page_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            stamps, response = entry
+            if cache.get_many(list(stamps)) == stamps:
+                return get_conditional_response(
+                    request,
+                    etag=response.get('ETag'),
+                    last_modified=parse_http_date_safe(
+                        response.get('Last-Modified', '')
+                    ),
+                    response=response,
+                )
+        response = self.get_response(request)
+        stamps = getattr(request, 'surrogate_keys', None)
+        if stamps and response.status_code == 200 and not response.cookies:
+            patch_cache_control(
+                response, public=True, max_age=0, must_revalidate=True
+            )
+            response['Surrogate-Key'] = surrogate_names(stamps)
+            if settings.PAGE_CACHE_PURGE_URL:
+                response['Surrogate-Control'] = (
+                    f'max-age={settings.PAGE_CACHE_SURROGATE_MAX_AGE}'
+                )
+            cache.set(key, (stamps, response), settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+
+class PostViewCountMiddleware:
+    """Считать просмотры поста, в том числе отданные из кеша страниц.
+
+    Стоит перед ``AnonymousPageCacheMiddleware``: просмотр засчитывается
+    и за ответ из кеша, и за ``304 Not Modified``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method == 'GET' and response.status_code in (200, 304):
+            match = resolver_match(request)
+            if match is not None and match.view_name == COUNTED_VIEW:
+                pageviews.record(match.kwargs['post_id'])
+        return response
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='Ключ')),
+                ('value', models.IntegerField(default=0, verbose_name='Значение')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='group',
+            name='title',
+            field=models.CharField(help_text='Группа, к которой будет относиться пост', max_length=200, verbose_name='Группа'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Загрузите изображение с вашего компьютера', upload_to='posts/', verbose_name='Картинка'),
+        ),
+    ]
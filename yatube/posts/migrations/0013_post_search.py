@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from posts import search
+
+
+def create_index(apps, schema_editor):
+    if search.is_supported(schema_editor.connection):
+        search.create_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    if search.is_supported(schema_editor.connection):
+        search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:14
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def count_comments(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    counts = Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+        'post'
+    ).annotate(num=Count('id')).values('num')
+    Post.objects.filter(comments__isnull=False).update(
+        comments_count=Subquery(counts)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:40
+
+import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Дата подписок, созданных до этой миграции: настоящая неизвестна,
+# а время развёртывания выдало бы их все за свежие.
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=EPOCH, verbose_name='Дата подписки'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='posts.Post')),
+                ('rank', models.PositiveIntegerField(unique=True, verbose_name='Место')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-17 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_related_posts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postterm',
+            index=models.Index(fields=['term', '-weight'], name='postterm_term_weight_idx'),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth import get_user_model
 
 from core.models import CreatedModel
+from core.querycache import CachedQuerySetMixin
 
 User = get_user_model()
 
@@ -19,6 +20,27 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(CachedQuerySetMixin, models.QuerySet):
+    FEED_FIELDS = (
+        'text',
+        'pub_date',
+        'updated',
+        'image',
+        'author',
+        'group',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group__slug',
+        'group__title',
+    )
+
+    def for_feed(self):
+        return self.select_related('author', 'group').only(
+            *self.FEED_FIELDS
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -28,6 +50,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -49,12 +75,49 @@ class Post(models.Model):
         blank=True,
         help_text='Загрузите изображение с вашего компьютера'
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    views = models.PositiveIntegerField(
+        'Просмотры',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_date_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_date_idx',
+            ),
+        ]
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_post(self, post):
+        return self.filter(post=post).select_related('author').only(
+            'text',
+            'created',
+            'post',
+            'author',
+            'author__username',
+        ).order_by('created', 'id')
 
 
 class Comment(CreatedModel):
@@ -73,9 +136,19 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария'
     )
 
+    objects = CommentQuerySet.as_manager()
+
     def __str__(self):
         return self.text
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('post', 'created'),
+                name='comment_post_created_idx',
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -88,3 +161,198 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+    created = models.DateTimeField(
+        'Дата подписки',
+        auto_now_add=True,
+        db_index=True
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow',
+            ),
+        ]
+
+
+class Counter(models.Model):
+    key = models.CharField(
+        'Ключ',
+        max_length=100,
+        unique=True
+    )
+    value = models.IntegerField(
+        'Значение',
+        default=0
+    )
+
+    def __str__(self):
+        return f'{self.key}={self.value}'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} ← {self.post}'
+
+
+class TrendingPost(models.Model):
+    """Место поста в рейтинге популярного, пересчитываемом периодически."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending'
+    )
+    rank = models.PositiveIntegerField('Место', unique=True)
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        ordering = ['rank']
+
+    def __str__(self):
+        return f'{self.rank}. {self.post}'
+
+
+class FollowSuggestion(models.Model):
+    """Автор, которого стоит почитать пользователю, с местом в списке."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    rank = models.PositiveSmallIntegerField('Место')
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        ordering = ['user', 'rank']
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'rank'),
+                name='unique_suggestion_rank',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} → {self.author}'
+
+
+class StaleSuggestions(models.Model):
+    """Пользователь, чьи подписки изменились после расчёта рекомендаций.
+
+    Отметка ставится и при удалении подписки вместе с пользователем,
+    поэтому внешнего ключа в базе нет.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True,
+        related_name='+'
+    )
+
+
+class Term(models.Model):
+    """Слово словаря похожих постов с обратной частотой документов.
+
+    Словарь пересобирается целиком вместе с весами ``PostTerm``,
+    которые удаляются первыми, поэтому каскада от слова к весам нет.
+    """
+
+    text = models.CharField('Слово', max_length=100, unique=True)
+    idf = models.FloatField('Обратная частота')
+
+    def __str__(self):
+        return self.text
+
+
+class PostTerm(models.Model):
+    """Вес слова в нормированном TF-IDF-векторе поста."""
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    term = models.ForeignKey(
+        Term,
+        on_delete=models.DO_NOTHING,
+        related_name='+'
+    )
+    weight = models.FloatField('Вес')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('post', 'term'),
+                name='unique_post_term',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['term', '-weight'], name='postterm_term_weight_idx'
+            ),
+        ]
+
+
+class RelatedPost(models.Model):
+    """Похожий пост с местом в списке похожих."""
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='related_posts'
+    )
+    related = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    rank = models.PositiveSmallIntegerField('Место')
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        ordering = ['rank']
+        constraints = [
+            models.UniqueConstraint(
+                fields=('post', 'rank'),
+                name='unique_related_rank',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.post} ~ {self.related}'
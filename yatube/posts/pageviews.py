@@ -0,0 +1,113 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Value, When
+
+from core import background
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Три параметра на пост (WHEN, THEN и IN) укладываются в лимит SQLite
+# на 999 параметров запроса.
+BATCH_SIZE = 300
+
+_buffer = Counter()
+_lock = threading.Lock()
+_timer = None
+
+
+def buffered():
+    """Копятся ли просмотры в буфере или пишутся сразу."""
+    return not background.runs_inline()
+
+
+def _flush_due():
+    background.submit(flush, key='pageviews:flush')
+
+
+def _add(deltas):
+    """Добавить приращения в буфер; вызывается под ``_lock``.
+
+    Первое приращение в пустом буфере заводит таймер, так что даже
+    у воркера без новых просмотров буфер сбрасывается не позже чем
+    через ``VIEW_COUNTS_FLUSH_INTERVAL`` секунд.
+    """
+    global _timer
+    if not _buffer and _timer is None:
+        _timer = threading.Timer(
+            settings.VIEW_COUNTS_FLUSH_INTERVAL, _flush_due
+        )
+        _timer.daemon = True
+        _timer.start()
+    _buffer.update(deltas)
+
+
+def record(post_id):
+    """Учесть просмотр поста в буфере процесса.
+
+    Накопленные приращения сбрасываются в ``Post.views`` фоновой
+    задачей по таймеру, так что просмотры не занимают блокировку
+    записи SQLite на каждом запросе. Если фоновые задачи выполняются
+    сразу (``BACKGROUND_WORKERS = 0`` или база в памяти), просмотр
+    записывается без буфера.
+    """
+    if not buffered():
+        _update([(post_id, 1)])
+        return
+    with _lock:
+        _add({post_id: 1})
+
+
+def pending(post_id):
+    with _lock:
+        return _buffer[post_id]
+
+
+def take():
+    """Забрать накопленные приращения, очистив буфер и таймер."""
+    global _timer
+    with _lock:
+        deltas = dict(_buffer)
+        _buffer.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    return deltas
+
+
+def _update(batch):
+    Post.objects.filter(
+        id__in=[post_id for post_id, _ in batch]
+    ).update(views=F('views') + Case(
+        *(When(id=post_id, then=Value(delta)) for post_id, delta in batch),
+        output_field=IntegerField(),
+    ))
+
+
+def flush():
+    """Записать накопленные приращения пачками ``UPDATE ... CASE``."""
+    deltas = take()
+    items = sorted(deltas.items())
+    for start in range(0, len(items), BATCH_SIZE):
+        batch = items[start:start + BATCH_SIZE]
+        try:
+            _update(batch)
+        except Exception:
+            with _lock:
+                _add(dict(items[start:]))
+            raise
+    return len(items)
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Не удалось сохранить просмотры при завершении')
+
+
+atexit.register(_flush_at_exit)
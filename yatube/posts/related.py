@@ -0,0 +1,308 @@
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from core import background, sparse
+
+from . import versions
+from .models import Post, PostTerm, RelatedPost, Term
+from .search import TERM
+
+BATCH_SIZE = 500
+
+DENSE_TERMS = 256
+
+# Размер плотного блока сходств одной пачки, ячеек.
+BLOCK_CELLS = 2 ** 22
+
+MIN_WORD_LENGTH = 3
+
+# Ограничение SQLite на число параметров запроса.
+MAX_PARAMS = 900
+
+
+def tokens(text):
+    """Слова текста в нижнем регистре, кроме совсем коротких."""
+    return [
+        word for word in TERM.findall(text.lower())
+        if len(word) >= MIN_WORD_LENGTH
+    ]
+
+
+def _chunks(values, size=MAX_PARAMS):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _normalized(rows, weights, size):
+    norms = np.sqrt(np.bincount(rows, weights ** 2, minlength=size))
+    return weights / norms[rows]
+
+
+def _counts(texts):
+    """Частоты слов всех текстов в виде столбцов строка/слово/число."""
+    vocabulary = {}
+    rows, cols, counts = [], [], []
+    for row, text in enumerate(texts):
+        for word, count in Counter(tokens(text)).items():
+            rows.append(row)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+            counts.append(count)
+    return (
+        list(vocabulary),
+        np.array(rows, dtype=np.int64),
+        np.array(cols, dtype=np.int64),
+        np.array(counts, dtype=np.float64),
+    )
+
+
+def vectorize(texts):
+    """TF-IDF-векторы текстов единичной длины.
+
+    Вес слова — ``(1 + log tf) · idf`` со сглаженной обратной частотой.
+    Слова, встречающиеся больше чем в ``RELATED_POSTS_MAX_DF`` доле
+    текстов, отбрасываются как служебные. Возвращает словарь, его idf
+    и столбцы разреженной матрицы: строка, слово, вес.
+    """
+    words, rows, cols, counts = _counts(texts)
+    total = len(texts)
+    frequency = np.bincount(cols, minlength=len(words))
+    idf = np.log((1 + total) / (1 + frequency)) + 1
+    kept = frequency <= settings.RELATED_POSTS_MAX_DF * total
+    numbers = np.cumsum(kept) - 1
+    used = kept[cols]
+    rows, cols, counts = rows[used], numbers[cols[used]], counts[used]
+    idf = idf[kept]
+    weights = (1 + np.log(counts)) * idf[cols]
+    return (
+        [word for word, keep in zip(words, kept) if keep], idf,
+        rows, cols, _normalized(rows, weights, total),
+    )
+
+
+def split(rows, cols, weights, shape):
+    """Разделить матрицу на плотную и разреженную части.
+
+    ``DENSE_TERMS`` самых частых слов дают длинные списки постов,
+    поэтому их столбцы хранятся плотной матрицей и умножаются через
+    BLAS; остальные — в CSR по строкам и по словам.
+    """
+    size, terms = shape
+    frequent = np.argsort(
+        -np.bincount(cols, minlength=terms), kind='stable'
+    )[:DENSE_TERMS]
+    position = np.full(terms, -1)
+    position[frequent] = np.arange(len(frequent))
+    dense = np.zeros((size, len(frequent)), dtype=np.float32)
+    common = position[cols] >= 0
+    dense[rows[common], position[cols[common]]] = weights[common]
+    rows, cols, weights = rows[~common], cols[~common], weights[~common]
+    return (
+        dense,
+        sparse.csr(rows, cols, size, weights),
+        sparse.csr(cols, rows, terms, weights),
+    )
+
+
+def neighbours(dense, matrix, postings, sources):
+    """Ближайшие по косинусу строки для номеров ``sources``.
+
+    Векторы нормированы, так что косинус — скалярное произведение.
+    Сходства пачки со всеми строками собираются в плотный блок
+    ``len(sources) × size``: плотная часть — произведение матриц,
+    разреженная — через списки строк каждого слова. Возвращает
+    столбцы: строка, похожая строка, сходство и место.
+    """
+    size = len(dense)
+    owners, words, values = sparse.expand(
+        matrix, sources, np.ones(len(sources))
+    )
+    pairs, similar, products = sparse.expand(postings, words, values)
+    block = (dense[sources] @ dense.T).astype(np.float64)
+    block += np.bincount(
+        owners[pairs] * size + similar, products,
+        minlength=len(sources) * size,
+    ).reshape(block.shape)
+    block[np.arange(len(sources)), sources] = 0
+    limit = min(settings.RELATED_POSTS_SIZE, size - 1)
+    top = np.argpartition(-block, limit - 1, axis=1)[:, :limit]
+    score = np.take_along_axis(block, top, axis=1)
+    order = np.lexsort((top, -score))
+    top = np.take_along_axis(top, order, axis=1)
+    score = np.take_along_axis(score, order, axis=1)
+    rank = np.broadcast_to(np.arange(1, limit + 1), top.shape)
+    found = score > 0
+    return (
+        np.broadcast_to(sources[:, None], top.shape)[found],
+        top[found], score[found], rank[found],
+    )
+
+
+def _store_related(post_ids, posts, related, score, rank):
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=post_ids).delete()
+        RelatedPost.objects.bulk_create(
+            (
+                RelatedPost(
+                    post_id=post_id, related_id=related_id,
+                    score=value, rank=place,
+                )
+                for post_id, related_id, value, place in zip(
+                    posts, related, score, rank,
+                )
+            ),
+            batch_size=BATCH_SIZE,
+        )
+    return len(posts)
+
+
+def _store_vectors(words, idf, post_ids, cols, weights):
+    with transaction.atomic():
+        PostTerm.objects.all().delete()
+        Term.objects.all().delete()
+        Term.objects.bulk_create(
+            (
+                Term(text=word, idf=value)
+                for word, value in zip(words, idf.tolist())
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        term_ids = dict(Term.objects.values_list('text', 'id'))
+        numbers = np.array([term_ids[word] for word in words])
+        PostTerm.objects.bulk_create(
+            (
+                PostTerm(post_id=post_id, term_id=term_id, weight=weight)
+                for post_id, term_id, weight in zip(
+                    post_ids.tolist(), numbers[cols].tolist(),
+                    weights.tolist(),
+                )
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+
+def rebuild():
+    """Пересчитать словарь, векторы всех постов и похожие посты.
+
+    Похожие ищутся пачками, каждая — одно умножение матриц с блоком
+    сходств не больше ``BLOCK_CELLS`` ячеек. Возвращает число постов
+    и сохранённых пар.
+    """
+    ids, texts = [], []
+    for post_id, text in Post.objects.order_by('id').values_list(
+        'id', 'text'
+    ).iterator():
+        ids.append(post_id)
+        texts.append(text)
+    ids = np.array(ids, dtype=np.int64)
+    words, idf, rows, cols, weights = vectorize(texts)
+    _store_vectors(words, idf, ids[rows], cols, weights)
+    dense, matrix, postings = split(
+        rows, cols, weights, (len(ids), len(words))
+    )
+    step = max(BLOCK_CELLS // max(len(ids), 1), 1)
+    stored = 0
+    for start in range(0, len(ids) if len(ids) > 1 else 0, step):
+        sources = np.arange(start, min(start + step, len(ids)))
+        posts, related, score, rank = neighbours(
+            dense, matrix, postings, sources
+        )
+        post_ids = ids[sources].tolist()
+        stored += _store_related(
+            post_ids, ids[posts].tolist(),
+            ids[related].tolist(), score.tolist(), rank.tolist(),
+        )
+        versions.bump(*map(versions.post_key, post_ids))
+    return len(ids), stored
+
+
+def _vector(text):
+    """Вектор текста по сохранённому словарю: слова и веса.
+
+    Слов, которых нет в словаре, нет и в векторах других постов до
+    следующего ``rebuild``, поэтому они не учитываются.
+    """
+    counts = Counter(tokens(text))
+    terms = [
+        term for chunk in _chunks(counts)
+        for term in Term.objects.filter(text__in=chunk).values_list(
+            'id', 'text', 'idf'
+        )
+    ]
+    if not terms:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    term_ids, words, idf = zip(*terms)
+    weights = (1 + np.log([counts[word] for word in words])) * idf
+    return np.array(term_ids), weights / np.sqrt((weights ** 2).sum())
+
+
+def _postings(post_id, term_id):
+    """Посты слова с наибольшими весами, не больше ``POSTINGS_LIMIT``.
+
+    У частых слов списки длиной с заметную долю всех постов, а вклад
+    в сходство — произведение весов, поэтому хвост с малыми весами
+    отбрасывается; его читает только полный ``rebuild``.
+    """
+    return PostTerm.objects.filter(term_id=term_id).exclude(
+        post_id=post_id
+    ).order_by('-weight').values_list(
+        'post_id', 'term_id', 'weight'
+    )[:settings.RELATED_POSTS_POSTINGS_LIMIT]
+
+
+def _similar(post_id, term_ids, weights):
+    """Ближайшие посты к вектору по спискам постов его слов."""
+    postings = np.array(
+        [
+            row for term_id in term_ids.tolist()
+            for row in _postings(post_id, term_id)
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 3)
+    posts = postings[:, 0].astype(np.int64)
+    order = np.argsort(term_ids)
+    query = weights[order][
+        np.searchsorted(term_ids[order], postings[:, 1].astype(np.int64))
+    ]
+    related, inverse = np.unique(posts, return_inverse=True)
+    score = np.bincount(inverse, postings[:, 2] * query)
+    top = np.lexsort((related, -score))[:settings.RELATED_POSTS_SIZE]
+    return related[top], score[top]
+
+
+def update(post_id):
+    """Пересчитать вектор и похожие посты одного поста."""
+    text = Post.objects.filter(pk=post_id).values_list(
+        'text', flat=True
+    ).first()
+    if text is None:
+        return
+    term_ids, weights = _vector(text)
+    related, score = _similar(post_id, term_ids, weights)
+    with transaction.atomic():
+        PostTerm.objects.filter(post_id=post_id).delete()
+        PostTerm.objects.bulk_create(
+            PostTerm(post_id=post_id, term_id=term_id, weight=weight)
+            for term_id, weight in zip(term_ids.tolist(), weights.tolist())
+        )
+        _store_related(
+            [post_id], [post_id] * len(related), related.tolist(),
+            score.tolist(), range(1, len(related) + 1),
+        )
+    versions.bump(versions.post_key(post_id))
+
+
+def schedule(post):
+    background.submit(update, post.pk, key=f'related:{post.pk}')
+
+
+def for_post(post_id):
+    """Похожие посты одним запросом по индексу ``(post, rank)``."""
+    return [
+        entry.related for entry in RelatedPost.objects.filter(
+            post_id=post_id
+        ).select_related('related__author')[:settings.RELATED_POSTS_SHOWN]
+    ]
@@ -0,0 +1,117 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+INDEX_TABLE = 'posts_post_fts'
+
+TRIGGERS = {
+    'posts_post_fts_insert': f'''AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {INDEX_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END''',
+    'posts_post_fts_delete': f'''AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {INDEX_TABLE}({INDEX_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END''',
+    'posts_post_fts_update': f'''AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {INDEX_TABLE}({INDEX_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {INDEX_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END''',
+}
+
+TERM = re.compile(r'\w+')
+
+
+def is_supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def create_index(using=connection):
+    """Создать индекс FTS5 по ``Post.text``, триггеры и заполнить его.
+
+    Индекс хранит только словарь (``content=posts_post``), сам текст
+    читается из таблицы постов.
+    """
+    with using.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5('
+            "text, content='posts_post', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('rebuild')"
+        )
+    install_triggers(using)
+
+
+def install_triggers(using=connection):
+    """Вернуть триггеры синхронизации, если их удалила миграция.
+
+    Изменение схемы ``posts_post`` в SQLite пересоздаёт таблицу вместе
+    с её триггерами, поэтому они проверяются после каждого migrate.
+    """
+    if INDEX_TABLE not in using.introspection.table_names():
+        return
+    with using.cursor() as cursor:
+        for name, body in TRIGGERS.items():
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+
+
+def drop_index(using=connection):
+    with using.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {INDEX_TABLE}')
+
+
+def match_expression(query):
+    """Перевести пользовательский запрос в выражение MATCH.
+
+    Каждое слово берётся в кавычки, поэтому синтаксис FTS5 (OR, NEAR,
+    звёздочки, двоеточия) в запросе не интерпретируется; слова
+    объединяются через AND.
+    """
+    return ' '.join(f'"{term}"' for term in TERM.findall(query))
+
+
+def matching(queryset, query):
+    """Посты из ``queryset``, содержащие все слова запроса."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    if not is_supported():
+        for term in TERM.findall(query):
+            queryset = queryset.filter(text__icontains=term)
+        return queryset
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s',
+        (expression,),
+    ))
+
+
+def search(query, queryset=None):
+    """Вернуть найденные посты и порядок для пагинатора.
+
+    На SQLite посты сортируются по релевантности bm25 (меньше —
+    лучше), на других СУБД — по дате.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    expression = match_expression(query)
+    if not expression or not is_supported():
+        return matching(queryset, query), ('-pub_date', '-id')
+    queryset = queryset.extra(
+        tables=[INDEX_TABLE],
+        where=[
+            f'{INDEX_TABLE}.rowid = posts_post.id',
+            f'{INDEX_TABLE} MATCH %s',
+        ],
+        params=[expression],
+    ).annotate(
+        rank=RawSQL(f'{INDEX_TABLE}.rank', (), output_field=FloatField())
+    )
+    return queryset, ('rank', '-id')
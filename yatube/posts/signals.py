@@ -0,0 +1,217 @@
+from django.core.cache import cache
+from django.db import connections
+from django.db.models.signals import (
+    post_delete, post_init, post_migrate, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from . import (
+    cards, counters, images, related, search, suggestions, timeline,
+    versions,
+)
+from .models import (
+    Comment, Counter, Follow, FollowSuggestion, Group, Post, RelatedPost,
+    User,
+)
+
+# Поля пользователя, которые выводятся в карточках, профиле
+# и комментариях.
+USER_DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def _post_keys(author_id, group_id):
+    keys = [counters.TOTAL_POSTS, counters.author_posts_key(author_id)]
+    if group_id is not None:
+        keys.append(counters.group_posts_key(group_id))
+    return keys
+
+
+@receiver(post_init, sender=Post)
+def remember_post_relations(sender, instance, **kwargs):
+    instance._counted = (instance.author_id, instance.group_id)
+    instance._versioned = instance._counted
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    current = (instance.author_id, instance.group_id)
+    if created:
+        for key in _post_keys(*current):
+            counters.change(key, 1)
+        timeline.fan_out(instance)
+    elif current != instance._counted:
+        old_keys = set(_post_keys(*instance._counted))
+        new_keys = set(_post_keys(*current))
+        for key in old_keys - new_keys:
+            counters.change(key, -1)
+        for key in new_keys - old_keys:
+            counters.change(key, 1)
+    instance._counted = current
+
+
+@receiver(pre_delete, sender=Post)
+def discard_timeline_entries(sender, instance, **kwargs):
+    timeline.discard(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    for key in _post_keys(*instance._counted):
+        counters.change(key, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+
+
+@receiver(post_delete, sender=Group)
+def drop_group_counter(sender, instance, **kwargs):
+    Counter.objects.filter(
+        key=counters.group_posts_key(instance.pk)
+    ).delete()
+
+
+@receiver(post_save, sender=Follow)
+def fill_follower_timeline(sender, instance, created, **kwargs):
+    if created:
+        counters.change(counters.followers_key(instance.author_id), 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_follower_timeline(sender, instance, **kwargs):
+    counters.change(counters.followers_key(instance.author_id), -1)
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def mark_stale_suggestions(sender, instance, **kwargs):
+    suggestions.mark_stale(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_versions(sender, instance, **kwargs):
+    keys = set(versions.feed_keys(instance.author_id, instance.group_id))
+    keys.update(versions.feed_keys(*instance._versioned))
+    keys.add(versions.post_key(instance.pk))
+    versions.bump(*keys)
+    cards.invalidate(instance.pk)
+    instance._versioned = (instance.author_id, instance.group_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(pre_delete, sender=Post)
+def bump_related_versions(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    listed_in = RelatedPost.objects.filter(related=instance).values_list(
+        'post_id', flat=True
+    )
+    versions.bump(*map(versions.post_key, listed_in))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_versions(sender, instance, **kwargs):
+    versions.bump(versions.post_key(instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def bump_group_versions(sender, instance, **kwargs):
+    posts = Post.objects.filter(group=instance).order_by()
+    authors = posts.values_list('author_id', flat=True).distinct()
+    post_ids = list(posts.values_list('id', flat=True))
+    cards.invalidate(*post_ids)
+    versions.bump(
+        versions.INDEX,
+        versions.TRENDING,
+        versions.group_key(instance.pk),
+        *(versions.profile_key(author_id) for author_id in authors),
+        *(versions.post_key(post_id) for post_id in post_ids),
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_versions(sender, instance, **kwargs):
+    versions.bump(versions.follow_key(instance.user_id))
+
+
+def _display_name(user):
+    return tuple(user.__dict__.get(name) for name in USER_DISPLAY_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_display_name(sender, instance, **kwargs):
+    instance._display_name = _display_name(instance)
+
+
+@receiver(post_save, sender=User)
+def bump_author_versions(sender, instance, created, **kwargs):
+    current = _display_name(instance)
+    if created or current == instance._display_name:
+        instance._display_name = current
+        return
+    posts = Post.objects.filter(author=instance).order_by()
+    groups = posts.filter(group__isnull=False).values_list(
+        'group_id', flat=True
+    ).distinct()
+    own = list(posts.values_list('id', flat=True))
+    cards.invalidate(*own)
+    post_ids = {
+        *own,
+        *Comment.objects.filter(author=instance).values_list(
+            'post_id', flat=True
+        ),
+        *RelatedPost.objects.filter(related__author=instance).values_list(
+            'post_id', flat=True
+        ),
+    }
+    readers = {
+        *Follow.objects.filter(author=instance).values_list(
+            'user_id', flat=True
+        ),
+        *FollowSuggestion.objects.filter(author=instance).values_list(
+            'user_id', flat=True
+        ),
+    }
+    versions.bump(
+        versions.INDEX,
+        versions.TRENDING,
+        versions.profile_key(instance.pk),
+        *map(versions.group_key, groups),
+        *map(versions.post_key, post_ids),
+        *map(versions.follow_key, readers),
+    )
+    instance._display_name = current
+
+
+@receiver(post_save, sender=Post)
+def schedule_post_thumbnail(sender, instance, update_fields=None, **kwargs):
+    if instance.image and (update_fields is None or 'image' in update_fields):
+        cache.delete(images.failure_key(instance.pk))
+        images.schedule(instance)
+
+
+@receiver(post_save, sender=Post)
+def schedule_post_vector(sender, instance, created, update_fields=None,
+                         **kwargs):
+    if created or update_fields is None or 'text' in update_fields:
+        related.schedule(instance)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    connection = connections[using]
+    if sender.name == 'posts' and search.is_supported(connection):
+        search.install_triggers(connection)
@@ -0,0 +1,191 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from core import sparse
+
+from . import versions
+from .models import Follow, FollowSuggestion, StaleSuggestions
+
+BATCH_SIZE = 500
+
+USERS_PER_BATCH = 256
+
+
+class Graph:
+    """Граф подписок в виде CSR-матриц в обе стороны.
+
+    Идентификаторы пользователей сжаты в номера ``0..n-1``: строка
+    ``following`` — авторы пользователя, строка ``followers`` — его
+    подписчики.
+    """
+
+    def __init__(self, users, authors):
+        self.ids, inverse = np.unique(
+            np.concatenate([users, authors]), return_inverse=True
+        )
+        size = len(self.ids)
+        rows, cols = inverse[:len(users)], inverse[len(users):]
+        self.following = sparse.csr(rows, cols, size)
+        self.followers = sparse.csr(cols, rows, size)
+
+    @classmethod
+    def load(cls):
+        edges = np.array(
+            Follow.objects.order_by().values_list('user_id', 'author_id'),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        return cls(edges[:, 0], edges[:, 1])
+
+    def readers(self):
+        """Номера пользователей, у которых есть подписки."""
+        return np.flatnonzero(np.diff(self.following[0]))
+
+    def positions(self, user_ids):
+        """Номера пользователей ``user_ids``, которые есть в графе."""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        if not len(self.ids):
+            return user_ids[:0]
+        positions = np.searchsorted(self.ids, user_ids).clip(
+            max=len(self.ids) - 1
+        )
+        return positions[self.ids[positions] == user_ids]
+
+    def suggest(self, sources):
+        """Рекомендации для номеров ``sources``.
+
+        Друзья друзей — авторы, на которых подписаны авторы
+        пользователя; совместные подписки — авторы тех, кто читает
+        тех же авторов, с весом по числу общих авторов. Берутся только
+        ``FOLLOW_SUGGESTIONS_PEERS`` самых похожих читателей, а авторы
+        с подписчиками больше ``FOLLOW_SUGGESTIONS_HUB_LIMIT`` похожих
+        не связывают: такая общая подписка почти ничего не говорит
+        о вкусах.
+
+        Возвращает столбцы: пользователь, автор, оценка и место.
+        """
+        weights = settings.FOLLOW_SUGGESTIONS_WEIGHTS
+        size = len(self.ids)
+        owners, authors, _ = sparse.expand(
+            self.following, sources, np.ones(len(sources))
+        )
+        readers = sources[owners]
+        ones = np.ones(len(authors))
+        owners, fof, fof_weights = sparse.expand(
+            self.following, authors, ones * weights['friends']
+        )
+        fof_readers = readers[owners]
+        indptr = self.followers[0]
+        narrow = (
+            indptr[authors + 1] - indptr[authors]
+            <= settings.FOLLOW_SUGGESTIONS_HUB_LIMIT
+        )
+        owners, peers, _ = sparse.expand(
+            self.followers, authors[narrow], ones[narrow]
+        )
+        peer_readers, peers, overlap = sparse.sum_pairs(
+            readers[narrow][owners], peers, ones[narrow][owners], size
+        )
+        others = peers != peer_readers
+        peer_readers, peers, overlap, _ = sparse.best(
+            peer_readers[others], peers[others], overlap[others],
+            settings.FOLLOW_SUGGESTIONS_PEERS,
+        )
+        owners, co, co_weights = sparse.expand(
+            self.following, peers, overlap * weights['cofollow']
+        )
+        users, candidates, score = sparse.sum_pairs(
+            np.concatenate([fof_readers, peer_readers[owners]]),
+            np.concatenate([fof, co]),
+            np.concatenate([fof_weights, co_weights]),
+            size,
+        )
+        fresh = (candidates != users) & ~np.isin(
+            users * size + candidates, readers * size + authors
+        )
+        users, candidates, score, rank = sparse.best(
+            users[fresh], candidates[fresh], score[fresh],
+            settings.FOLLOW_SUGGESTIONS_SIZE,
+        )
+        return self.ids[users], self.ids[candidates], score, rank
+
+
+def mark_stale(*user_ids):
+    StaleSuggestions.objects.bulk_create(
+        [StaleSuggestions(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+
+
+def _take_stale(full):
+    with transaction.atomic():
+        stale = StaleSuggestions.objects.all()
+        user_ids = [] if full else list(
+            stale.values_list('user_id', flat=True)
+        )
+        stale.delete()
+    return np.array(user_ids, dtype=np.int64)
+
+
+def _store(user_ids, users, authors, score, rank):
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(
+            user_id__in=user_ids.tolist()
+        ).delete()
+        FollowSuggestion.objects.bulk_create(
+            (
+                FollowSuggestion(
+                    user_id=user_id, author_id=author_id,
+                    score=value, rank=place,
+                )
+                for user_id, author_id, value, place in zip(
+                    users.tolist(), authors.tolist(),
+                    score.tolist(), rank.tolist(),
+                )
+            ),
+            batch_size=BATCH_SIZE,
+        )
+    versions.bump(*map(versions.follow_key, user_ids.tolist()))
+    return len(users)
+
+
+def refresh(full=False):
+    """Пересчитать рекомендации, кого почитать.
+
+    По умолчанию — только для пользователей, отмеченных
+    ``mark_stale`` после прошлого запуска; ``full`` пересчитывает всех.
+    Граф загружается после снятия отметок, так что подписки, сделанные
+    во время расчёта, попадут в следующий запуск. Возвращает число
+    пересчитанных пользователей и сохранённых рекомендаций.
+    """
+    targets = _take_stale(full)
+    graph = Graph.load()
+    if full:
+        targets = np.union1d(
+            graph.ids[graph.readers()],
+            np.array(
+                FollowSuggestion.objects.order_by().values_list(
+                    'user_id', flat=True
+                ).distinct(),
+                dtype=np.int64,
+            ),
+        )
+    stored = 0
+    for start in range(0, len(targets), USERS_PER_BATCH):
+        batch = targets[start:start + USERS_PER_BATCH]
+        stored += _store(batch, *graph.suggest(graph.positions(batch)))
+    return len(targets), stored
+
+
+def for_user(user):
+    """Авторы, которых стоит почитать ``user``, кроме уже читаемых."""
+    if not user.is_authenticated:
+        return []
+    queryset = FollowSuggestion.objects.filter(user=user).exclude(
+        author__following__user=user
+    )
+    return [
+        suggestion.author for suggestion in queryset.select_related(
+            'author'
+        )[:settings.FOLLOW_SUGGESTIONS_SHOWN]
+    ]
@@ -0,0 +1,10 @@
+from django import template
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.filter
+def with_cards(posts):
+    return render_cards(posts)
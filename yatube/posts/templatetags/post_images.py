@@ -0,0 +1,10 @@
+from django import template
+
+from posts.images import picture
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_picture.html')
+def post_picture(post):
+    return {'picture': picture(post)}
@@ -0,0 +1,117 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from ..counters import follower_count, post_count, reconcile
+from ..management.commands import explain_views
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class ExplainViewsCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        post = Post.objects.create(author=author, text='Пост', group=group)
+        Comment.objects.create(post=post, author=reader, text='Комментарий')
+        Follow.objects.create(user=reader, author=author)
+        reconcile()
+
+    def test_feeds_do_not_scan_posts(self):
+        out = StringIO()
+        call_command('explain_views', stdout=out)
+        report = out.getvalue()
+        for name in ('posts:index', 'posts:profile', 'posts:follow_index'):
+            with self.subTest(name=name):
+                self.assertIn(name, report)
+        for kind in ('полный просмотр', 'просмотр индекса'):
+            for table in ('posts_post', 'posts_comment'):
+                with self.subTest(kind=kind, table=table):
+                    self.assertNotIn(f'{kind} {table}', report)
+
+    def test_unbounded_index_scan_is_reported(self):
+        tables = {'posts_post'}
+        unbounded = 'SELECT id FROM posts_post ORDER BY pub_date'
+        self.assertEqual(
+            list(explain_views.scans(unbounded, tables)),
+            [('posts_post', True)],
+        )
+        self.assertEqual(
+            list(explain_views.scans(f'{unbounded} LIMIT 10', tables)), []
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchCommandsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_bench', '--users=30', '--groups=3', '--posts=200',
+            '--follows=4', '--hot-posts=2', '--hot-comments=25',
+            '--images=1', stdout=StringIO(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.baseline = f'{self.directory}/baseline.json'
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_seed_creates_consistent_data(self):
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(post_count(), 200)
+        self.assertEqual(Comment.objects.count(), 50)
+        hot = Post.objects.order_by('-comments_count').first()
+        self.assertEqual(hot.comments_count, 25)
+        author = User.objects.order_by('id').first()
+        self.assertEqual(
+            follower_count(author.id),
+            Follow.objects.filter(author=author).count(),
+        )
+        expected = sum(
+            Post.objects.filter(author_id=author_id).count()
+            for author_id in Follow.objects.values_list('author', flat=True)
+        )
+        self.assertEqual(TimelineEntry.objects.count(), expected)
+        dates = Post.objects.values_list('pub_date', flat=True)
+        self.assertGreater(len(set(dates)), 1)
+
+    def run_bench(self, *args):
+        out = StringIO()
+        call_command(
+            'bench', '--iterations=2', '--warmup=0',
+            f'--baseline={self.baseline}', *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_bench_compares_with_baseline(self):
+        report = self.run_bench('--save-baseline')
+        for name in ('posts:index', 'posts:follow_index', 'users:login'):
+            with self.subTest(name=name):
+                self.assertIn(name, report)
+        with open(self.baseline) as file:
+            baseline = json.load(file)
+        self.assertIn('p95_ms', baseline['posts:index'])
+        baseline['posts:index']['queries'] = 0
+        with open(self.baseline, 'w') as file:
+            json.dump(baseline, file)
+        with self.assertRaises(CommandError):
+            self.run_bench('--threshold=1000')
@@ -0,0 +1,147 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+
+from .. import pageviews
+from ..counters import post_count
+from ..models import Comment, Counter, Group, Post, User
+
+
+class PostCounterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.group_other = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание',
+        )
+        Post.objects.create(author=cls.user, text='Пост', group=cls.group)
+
+    def assertCounts(self, total, author, group, group_other):
+        self.assertEqual(post_count(), total)
+        self.assertEqual(post_count(author=self.user), author)
+        self.assertEqual(post_count(group=self.group), group)
+        self.assertEqual(post_count(group=self.group_other), group_other)
+
+    def test_counters_follow_post_changes(self):
+        self.assertCounts(1, 1, 1, 0)
+        post = Post.objects.create(
+            author=self.user, text='Ещё пост', group=self.group
+        )
+        self.assertCounts(2, 2, 2, 0)
+        post.group = self.group_other
+        post.save()
+        self.assertCounts(2, 2, 1, 1)
+        post.delete()
+        self.assertCounts(1, 1, 1, 0)
+
+    def test_stored_counter_does_not_count_rows(self):
+        post_count(author=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            post_count(author=self.user)
+        self.assertNotIn('COUNT', queries[0]['sql'])
+
+    def test_reconcile_command_fixes_stale_counters(self):
+        post_count(author=self.user)
+        Counter.objects.update(value=100)
+        Post.objects.bulk_create(
+            [Post(author=self.user, text='Пачка') for _ in range(3)]
+        )
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertCounts(4, 4, 1, 0)
+
+    def test_comment_count_follows_comments(self):
+        post = Post.objects.get()
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_reconcile_command_fixes_comment_counts(self):
+        post = Post.objects.get()
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.user, text='Пачка')
+            for _ in range(2)
+        ])
+        call_command('reconcile_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+
+
+class PageViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Пост {number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        pageviews.take()
+        buffered = mock.patch.object(
+            pageviews, 'buffered', return_value=True
+        )
+        buffered.start()
+        self.addCleanup(buffered.stop)
+        self.addCleanup(pageviews.take)
+
+    def test_views_are_buffered_and_flushed_in_one_update(self):
+        first, second, _ = self.posts
+        url = reverse('posts:post_detail', kwargs={'post_id': first.id})
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        pageviews.record(second.id)
+        self.assertEqual(pageviews.pending(first.id), 3)
+        first.refresh_from_db()
+        self.assertEqual(first.views, 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(pageviews.flush(), 2)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('CASE', queries[0]['sql'])
+        views = dict(Post.objects.values_list('id', 'views'))
+        self.assertEqual(
+            views, {first.id: 3, second.id: 1, self.posts[2].id: 0}
+        )
+        self.assertEqual(pageviews.pending(first.id), 0)
+
+    @override_settings(VIEW_COUNTS_FLUSH_INTERVAL=0)
+    def test_timer_flushes_quiet_buffer(self):
+        with mock.patch.object(pageviews.background, 'submit') as submit:
+            pageviews.record(self.posts[0].id)
+            pageviews._timer.join(1)
+        submit.assert_called_once_with(
+            pageviews.flush, key='pageviews:flush'
+        )
+
+    def test_flush_cancels_timer(self):
+        pageviews.record(self.posts[0].id)
+        timer = pageviews._timer
+        pageviews.flush()
+        self.assertIsNone(pageviews._timer)
+        self.assertTrue(timer.finished.is_set())
+
+    def test_inline_mode_writes_views_directly(self):
+        post = self.posts[0]
+        with mock.patch.object(pageviews, 'buffered', return_value=False):
+            pageviews.record(post.id)
+        self.assertEqual(pageviews.pending(post.id), 0)
+        post.refresh_from_db()
+        self.assertEqual(post.views, 1)
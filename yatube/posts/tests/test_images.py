@@ -0,0 +1,96 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import images, versions
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_original_is_served_until_thumbnail_is_ready(self):
+        with mock.patch.object(images, 'schedule') as schedule:
+            picture = images.picture(self.post)
+        self.assertEqual(picture['src'], self.post.image.url)
+        self.assertEqual(picture['srcset'], '')
+        schedule.assert_called_once_with(self.post)
+
+    def test_generated_variants_replace_original(self):
+        stamp, = versions.get_versions(versions.post_key(self.post.pk))
+        images.generate(self.post.pk)
+        with mock.patch.object(images, 'schedule') as schedule:
+            picture = images.picture(self.post)
+        self.assertTrue(
+            picture['src'].startswith(settings.MEDIA_URL + 'cache/')
+        )
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertIn(f' {width}w', picture['srcset'])
+        self.assertEqual(len(picture['sources']), len(images.image_formats()))
+        schedule.assert_not_called()
+        self.assertGreater(
+            versions.get_versions(versions.post_key(self.post.pk))[0], stamp
+        )
+
+    @override_settings(POST_IMAGE_FORMATS=('AVIF', 'BMP'))
+    def test_unsupported_formats_are_skipped(self):
+        self.assertEqual(images.image_formats(), [])
+        self.assertEqual(
+            {image_format for image_format, _, _ in images.variants()},
+            {images.FALLBACK_FORMAT},
+        )
+
+    def test_encode_images_command(self):
+        out = StringIO()
+        call_command('encode_images', '--force', stdout=out)
+        self.assertIn('Обработано изображений: 1', out.getvalue())
+        self.assertNotEqual(
+            images.picture(self.post)['src'], self.post.image.url
+        )
+
+    def test_broken_source_is_not_rescheduled(self):
+        post = Post.objects.create(
+            author=self.user, text='Без файла', image='posts/missing.gif'
+        )
+        images.generate(post.pk)
+        with mock.patch.object(images, 'schedule') as schedule:
+            picture = images.picture(post)
+        self.assertEqual(picture['src'], post.image.url)
+        schedule.assert_not_called()
@@ -1,3 +1,4 @@
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
 from ..models import Group, Post, User, Comment, Follow
@@ -98,3 +99,7 @@ class PostModelTest(TestCase):
             comment._meta.get_field('text').help_text,
             'Введите текст комментария'
         )
+
+    def test_follow_pair_is_unique(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.follower, author=self.user)
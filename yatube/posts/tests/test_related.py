@@ -0,0 +1,133 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .. import related
+from ..models import Post, PostTerm, RelatedPost, Term, User
+
+TEXTS = {
+    'sea': 'Море солнце пляж отпуск море',
+    'beach': 'Пляж море песок отпуск',
+    'city': 'Город метро улица пробки',
+    'metro': 'Метро город поезд станция',
+    'book': 'Книга роман автор глава',
+}
+
+
+class RelatedPostsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.posts = {
+            name: Post.objects.create(author=cls.user, text=text)
+            for name, text in TEXTS.items()
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def related(self, name):
+        return [post.pk for post in related.for_post(self.posts[name].pk)]
+
+    def test_vectors_have_unit_length(self):
+        words, idf, rows, cols, weights = related.vectorize(
+            ['море пляж море', 'пляж город', 'книга', 'поезд']
+        )
+        self.assertEqual(words, ['море', 'пляж', 'город', 'книга', 'поезд'])
+        self.assertEqual(rows.tolist(), [0, 0, 1, 1, 2, 3])
+        norms = [sum(weights[rows == row] ** 2) for row in range(4)]
+        for norm in norms:
+            self.assertAlmostEqual(norm, 1)
+        self.assertLess(idf[1], idf[0])
+
+    def test_frequent_words_are_dropped(self):
+        words, *_ = related.vectorize(['море пляж', 'море город', 'море'])
+        self.assertNotIn('море', words)
+
+    def test_rebuild_stores_nearest_posts(self):
+        posts, stored = related.rebuild()
+        self.assertEqual(posts, 5)
+        self.assertEqual(self.related('sea'), [self.posts['beach'].pk])
+        self.assertEqual(self.related('metro'), [self.posts['city'].pk])
+        self.assertEqual(self.related('book'), [])
+        self.assertEqual(stored, RelatedPost.objects.count())
+        self.assertEqual(
+            Term.objects.count(),
+            PostTerm.objects.values('term').distinct().count(),
+        )
+
+    def test_update_vectorizes_single_post(self):
+        related.rebuild()
+        post = Post.objects.create(
+            author=self.user, text='Станция метро закрыта, новый роман'
+        )
+        related.update(post.pk)
+        self.assertEqual(
+            [entry.pk for entry in related.for_post(post.pk)],
+            [self.posts['metro'].pk, self.posts['book'].pk,
+             self.posts['city'].pk],
+        )
+        self.assertTrue(PostTerm.objects.filter(post=post).exists())
+
+    @override_settings(RELATED_POSTS_POSTINGS_LIMIT=1)
+    def test_update_reads_top_postings_per_term(self):
+        related.rebuild()
+        term = Term.objects.get(text='метро')
+        heaviest = PostTerm.objects.filter(term=term).order_by(
+            '-weight'
+        ).values_list('post_id', flat=True).first()
+        post = Post.objects.create(author=self.user, text='Метро')
+        self.assertEqual(
+            [row[0] for row in related._postings(post.pk, term.pk)],
+            [heaviest],
+        )
+        related.update(post.pk)
+        self.assertEqual(
+            [entry.pk for entry in related.for_post(post.pk)], [heaviest]
+        )
+
+    def test_post_page_lists_related_posts(self):
+        related.rebuild()
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.posts['sea'].pk}
+        ))
+        self.assertEqual(
+            response.context['related_posts'], [self.posts['beach']]
+        )
+        self.assertContains(response, 'Похожие записи')
+
+    def test_related_post_changes_refresh_validators(self):
+        beach = self.posts['beach']
+        beach.author = User.objects.create_user(username='other')
+        beach.save()
+        related.rebuild()
+        url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.posts['sea'].pk}
+        )
+        for change in ('save', 'delete'):
+            with self.subTest(change=change):
+                etag = self.client.get(url)['ETag']
+                getattr(beach, change)()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_command_reports_counts(self):
+        out = StringIO()
+        call_command('compute_related', stdout=out)
+        self.assertIn('Постов: 5', out.getvalue())
+
+
+class RelatedOnSaveTest(TransactionTestCase):
+    def test_saved_post_is_vectorized_after_commit(self):
+        user = User.objects.create_user(username='auth')
+        first = Post.objects.create(author=user, text=TEXTS['city'])
+        Post.objects.create(author=user, text=TEXTS['book'])
+        related.rebuild()
+        post = Post.objects.create(author=user, text=TEXTS['metro'])
+        self.assertEqual(related.for_post(post.pk), [first])
+        post.text = TEXTS['book']
+        post.save(update_fields=['text'])
+        self.assertNotIn(first, related.for_post(post.pk))
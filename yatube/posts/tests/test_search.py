@@ -0,0 +1,92 @@
+from django.contrib.admin.sites import site
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post, User
+from ..views import POSTS_PER_PAGE
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        cls.weak = Post.objects.create(
+            author=cls.author,
+            text='Кошка сидит на длинном-длинном заборе у старого дома',
+        )
+        cls.strong = Post.objects.create(
+            author=cls.author, text='Кошка и кошка', group=cls.group
+        )
+        cls.foreign = Post.objects.create(
+            author=cls.other, text='Собака и кошка'
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def get_posts(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return list(response.context['page_obj'])
+
+    def test_results_are_ranked(self):
+        self.assertEqual(
+            self.get_posts(q='кошка'), [self.strong, self.foreign, self.weak]
+        )
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.get_posts(q='кошка собака'), [self.foreign])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.get_posts(q='кошка OR "собака'), [])
+        self.assertEqual(self.get_posts(q='*'), [])
+
+    def test_filters(self):
+        self.assertEqual(
+            self.get_posts(q='кошка', group=self.group.slug), [self.strong]
+        )
+        self.assertEqual(
+            self.get_posts(q='кошка', author='other'), [self.foreign]
+        )
+
+    def test_index_follows_post_changes(self):
+        post = Post.objects.get(pk=self.weak.pk)
+        post.text = 'Забор без животных'
+        post.save()
+        self.assertEqual(self.get_posts(q='забор'), [post])
+        self.assertNotIn(post, self.get_posts(q='кошка'))
+        Post.objects.filter(pk=self.foreign.pk).delete()
+        self.assertEqual(self.get_posts(q='собака'), [])
+
+    def test_pages_keep_query(self):
+        Post.objects.bulk_create(
+            Post(author=self.other, text=f'Кошка номер {number}')
+            for number in range(POSTS_PER_PAGE)
+        )
+        response = self.client.get(reverse('posts:search'), {'q': 'кошка'})
+        first = list(response.context['page_obj'])
+        cursor = response.context['page_obj'].keyset.next_cursor
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%88%D0%BA%D0%B0&')
+        second = self.get_posts(q='кошка', cursor=cursor)
+        self.assertEqual(len(first) + len(second), POSTS_PER_PAGE + 3)
+        self.assertFalse(set(first) & set(second))
+
+    def test_triggers_survive_table_rebuild(self):
+        search.drop_index()
+        search.create_index()
+        search.install_triggers()
+        Post.objects.create(author=self.other, text='Попугай')
+        self.assertEqual(len(self.get_posts(q='попугай')), 1)
+
+    def test_admin_uses_index(self):
+        admin = site._registry[Post]
+        request = RequestFactory().get('/')
+        queryset, duplicates = admin.get_search_results(
+            request, Post.objects.all(), 'собака'
+        )
+        self.assertEqual(list(queryset), [self.foreign])
+        self.assertFalse(duplicates)
@@ -0,0 +1,107 @@
+from io import StringIO
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import suggestions
+from ..models import Follow, FollowSuggestion, StaleSuggestions, User
+
+
+class SuggestionsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'peer', 'star', 'rare', 'own')
+        }
+        for user, author in (
+            ('reader', 'friend'), ('reader', 'own'),
+            ('friend', 'star'), ('friend', 'reader'),
+            ('peer', 'own'), ('peer', 'star'), ('peer', 'rare'),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def suggested(self, name):
+        return list(FollowSuggestion.objects.filter(
+            user=self.users[name]
+        ).values_list('author__username', flat=True))
+
+    def test_graph_is_compressed_to_csr(self):
+        graph = suggestions.Graph(
+            np.array([10, 10, 30]), np.array([30, 20, 10])
+        )
+        self.assertEqual(graph.ids.tolist(), [10, 20, 30])
+        indptr, indices = graph.following
+        self.assertEqual(indptr.tolist(), [0, 2, 2, 3])
+        self.assertEqual(indices.tolist(), [1, 2, 0])
+        self.assertEqual(graph.readers().tolist(), [0, 2])
+        self.assertEqual(graph.positions([30, 40]).tolist(), [2])
+
+    def test_full_refresh_ranks_friends_and_cofollows(self):
+        users, stored = suggestions.refresh(full=True)
+        self.assertEqual(users, 3)
+        self.assertEqual(self.suggested('reader'), ['star', 'rare'])
+        self.assertNotIn('reader', self.suggested('friend'))
+        self.assertFalse(StaleSuggestions.objects.exists())
+
+    @override_settings(FOLLOW_SUGGESTIONS_HUB_LIMIT=1)
+    def test_popular_authors_do_not_link_cofollowers(self):
+        suggestions.refresh(full=True)
+        self.assertEqual(self.suggested('reader'), ['star'])
+
+    def test_incremental_refresh_updates_stale_users_only(self):
+        suggestions.refresh(full=True)
+        friend_suggestions = self.suggested('friend')
+        Follow.objects.filter(
+            user=self.users['reader'], author=self.users['own']
+        ).delete()
+        self.assertEqual(
+            set(StaleSuggestions.objects.values_list('user', flat=True)),
+            {self.users['reader'].pk, self.users['own'].pk},
+        )
+        users, _ = suggestions.refresh()
+        self.assertEqual(users, 2)
+        self.assertEqual(self.suggested('reader'), ['star'])
+        self.assertEqual(self.suggested('friend'), friend_suggestions)
+
+    def test_pages_show_suggestions_not_followed_yet(self):
+        suggestions.refresh(full=True)
+        self.client.force_login(self.users['reader'])
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            response.context['suggestions'],
+            [self.users['star'], self.users['rare']],
+        )
+        Follow.objects.create(
+            user=self.users['reader'], author=self.users['rare']
+        )
+        response = self.client.get(reverse(
+            'posts:profile', kwargs={'username': 'reader'}
+        ))
+        self.assertEqual(response.context['suggestions'], [self.users['star']])
+        response = self.client.get(reverse(
+            'posts:profile', kwargs={'username': 'star'}
+        ))
+        self.assertNotContains(response, 'Кого почитать')
+
+    def test_refresh_changes_follow_validators(self):
+        self.client.force_login(self.users['reader'])
+        url = reverse('posts:follow_index')
+        etag = self.client.get(url)['ETag']
+        suggestions.refresh(full=True)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Кого почитать')
+
+    def test_command_reports_counts(self):
+        out = StringIO()
+        call_command('compute_suggestions', '--full', stdout=out)
+        self.assertIn('Пересчитано пользователей: 3', out.getvalue())
@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Counter, Follow, Post, TimelineEntry, User
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def stored_count(self):
+        return Counter.objects.get(key=timeline.count_key(self.reader.pk))
+
+    def feed_count(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return response.context['page_obj'].paginator.count
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 1
+        )
+        self.assertEqual(self.feed(), ['Старый'])
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.feed(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(self.feed(), ['Новый', 'Старый'])
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=0)
+    def test_popular_author_is_merged_on_read(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__text='Новый').exists()
+        )
+        self.assertEqual(self.feed(), ['Новый', 'Старый'])
+
+    def test_counter_follows_timeline_changes(self):
+        self.assertEqual(timeline.entry_count(self.reader.pk), 0)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stored_count().value, 1)
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(self.stored_count().value, 2)
+        post.delete()
+        self.assertEqual(self.stored_count().value, 1)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertEqual(self.stored_count().value, 0)
+
+    def test_feed_count_is_read_from_counter(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Counter.objects.update_or_create(
+            key=timeline.count_key(self.reader.pk), defaults={'value': 7}
+        )
+        self.assertEqual(self.feed_count(), 7)
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=0)
+    def test_read_mode_switch_drops_materialized_entries(self):
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed_count(), 1)
+        Follow.objects.create(user=other, author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(self.feed(), ['Новый', 'Старый'])
+        self.assertEqual(self.feed_count(), 2)
@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Follow, Group, Post, TrendingPost, User
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.popular = User.objects.create_user(username='popular')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.now = timezone.now()
+        cls.old = Post.objects.create(author=cls.author, text='Старый')
+        cls.quiet = Post.objects.create(author=cls.author, text='Тихий')
+        cls.discussed = Post.objects.create(
+            author=cls.author, text='Обсуждаемый'
+        )
+        cls.followed = Post.objects.create(
+            author=cls.popular, text='Автор набирает подписчиков'
+        )
+        Post.objects.filter(pk=cls.old.pk).update(
+            pub_date=cls.now - timedelta(days=30)
+        )
+        for _ in range(5):
+            Comment.objects.create(
+                post=cls.discussed, author=cls.reader, text='Комментарий'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.popular)
+        Follow.objects.create(user=cls.author, author=cls.popular)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_compute_ranks_recent_posts(self):
+        scored, stored = trending.compute(self.now)
+        self.assertEqual((scored, stored), (3, 3))
+        ranking = list(TrendingPost.objects.values_list('post', flat=True))
+        self.assertEqual(
+            ranking, [self.discussed.pk, self.followed.pk, self.quiet.pk]
+        )
+
+    def test_views_raise_score(self):
+        Post.objects.filter(pk=self.quiet.pk).update(views=10 ** 6)
+        trending.compute(self.now)
+        self.assertEqual(TrendingPost.objects.get(rank=1).post, self.quiet)
+
+    def test_trending_page_follows_ranking(self):
+        trending.compute(self.now)
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.discussed.pk, self.followed.pk, self.quiet.pk],
+        )
+        self.assertFalse(response.context['page_obj'].keyset.has_next())
+
+    def test_trending_page_follows_post_changes(self):
+        trending.compute(self.now)
+        url = reverse('posts:trending')
+        self.assertContains(self.client.get(url), 'Обсуждаемый')
+        post = Post.objects.get(pk=self.discussed.pk)
+        post.text = 'Исправленный'
+        post.save()
+        self.assertContains(self.client.get(url), 'Исправленный')
+        post.delete()
+        self.assertNotContains(self.client.get(url), 'Исправленный')
+
+    def test_trending_page_follows_group_changes(self):
+        group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.filter(pk=self.discussed.pk).update(group=group)
+        trending.compute(self.now)
+        url = reverse('posts:trending')
+        self.assertContains(self.client.get(url), 'Группа')
+        group.title = 'Переименованная'
+        group.save()
+        self.assertContains(self.client.get(url), 'Переименованная')
+
+    def test_empty_window(self):
+        self.assertEqual(
+            trending.compute(self.now + timedelta(days=365)), (0, 0)
+        )
+        response = self.client.get(reverse('posts:trending'))
+        self.assertContains(response, 'Рейтинг ещё не рассчитан')
@@ -1,6 +1,8 @@
 import shutil
 import tempfile
+from base64 import urlsafe_b64encode
 from itertools import islice
+from unittest import mock
 
 from django import forms
 from django.conf import settings
@@ -9,9 +11,13 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db.models.fields.files import ImageFieldFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 
 from ..models import Post, Group, User, Follow, Comment
+from .. import counters, pageviews, timeline, versions
 from ..forms import PostForm
+from ..views import COMMENTS_PER_PAGE, POSTS_PER_PAGE
+from .utils import QueryBudgetMixin
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -225,13 +231,39 @@ class PostPagesTests(TestCase):
         )
         response = self.guest_client.get(reverse('posts:index'))
         cache_with_post = response.content
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Без сигналов')
         response = self.guest_client.get(reverse('posts:index'))
         self.assertEqual(response.content, cache_with_post)
         cache.clear()
         response = self.guest_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, cache_with_post)
 
+    def test_cache_is_invalidated_by_post_changes(self):
+        cache.clear()
+        post = Post.objects.create(
+            author=self.user,
+            text='Тест кеш пост',
+        )
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), post.text)
+        post.delete()
+        for url in pages:
+            with self.subTest(url=url):
+                self.assertNotContains(self.guest_client.get(url), post.text)
+
+    def test_cache_varies_on_page(self):
+        cache.clear()
+        for number in range(POSTS_PER_PAGE):
+            Post.objects.create(author=self.user, text=f'Пост {number}')
+        first = self.guest_client.get(reverse('posts:index'))
+        second = self.guest_client.get(reverse('posts:index'), {'page': 2})
+        self.assertNotEqual(first.content, second.content)
+
     def test_comment_form_for_unauthorized_user(self):
         comment_count = Comment.objects.count()
         form_data = {
@@ -355,6 +387,7 @@ class PaginatorViewsTest(TestCase):
 
     def setUp(self):
         self.guest_client = Client()
+        cache.clear()
 
     def test_pages_has_paginator_contains_required_records(self):
         page_names = {
@@ -369,3 +402,365 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(response.context['page_obj']), 10)
                 response = self.guest_client.get(reverse_name, {'page': 2})
                 self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_cursor_pages_follow_keyset_order(self):
+        response = self.guest_client.get(reverse('posts:index'))
+        first_page = list(response.context['page_obj'])
+        next_cursor = response.context['page_obj'].keyset.next_cursor
+        Post.objects.create(author=self.user, text='Новый пост')
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': next_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 3)
+        self.assertEqual(page_obj.number, 2)
+        self.assertFalse(page_obj.keyset.has_next())
+        self.assertTrue(set(page_obj).isdisjoint(first_page))
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': page_obj.keyset.previous_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), first_page)
+
+    def test_last_page_is_read_from_the_end(self):
+        response = self.guest_client.get(reverse('posts:index'))
+        last_cursor = response.context['page_obj'].paginator.last_cursor
+        self.assertContains(response, f'cursor={last_cursor}')
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': last_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(
+            [post.text for post in page_obj],
+            ['Тестовый пост номер %s' % i for i in (2, 1, 0)],
+        )
+        self.assertFalse(page_obj.keyset.has_next())
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': page_obj.keyset.previous_cursor}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        post = Post.objects.order_by('id').first()
+        values = f'["{post.pub_date.isoformat()}", {post.id}]'
+        cursors = ['broken'] + [
+            urlsafe_b64encode(raw.encode()).decode()
+            for raw in (
+                f'["f", Infinity, {values}]',
+                '["b", Infinity, []]',
+                f'["f", "2", {values}]',
+                f'["f", 2, ["{post.pub_date.isoformat()}", 1e400]]',
+            )
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.guest_client.get(
+                    reverse('posts:index'), {'cursor': cursor}
+                )
+                self.assertEqual(response.context['page_obj'].number, 1)
+                self.assertEqual(len(response.context['page_obj']), 10)
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Популярный')
+        for number in range(COMMENTS_PER_PAGE + 5):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {number}'
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_batch(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertTrue(comments.keyset.has_next())
+        self.assertEqual(response.context['post'].comments_count, 25)
+        self.assertContains(response, reverse(
+            'posts:comments', kwargs={'post_id': self.post.id}
+        ))
+
+    def test_fragment_returns_next_batch(self):
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:comments', kwargs={'post_id': self.post.id}),
+            {'cursor': first.keyset.next_cursor},
+        )
+        self.assertTemplateNotUsed(response, 'base.html')
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Комментарий {number}' for number in range(20, 25)],
+        )
+        self.assertFalse(comments.keyset.has_next())
+        self.assertNotContains(response, 'data-load-more')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_pages_are_not_modified(self):
+        self.client.force_login(self.reader)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                self.assertIn('Cookie', response['Vary'])
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertIsNone(response.context)
+
+    def test_changes_refresh_validators(self):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Post.objects.create(
+            author=self.user, text='Новый пост', group=self.group
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_author_rename_refreshes_validators(self):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Лев'
+        author.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_login_keeps_validators(self):
+        url = self.urls[2]
+        etag = self.client.get(url)['ETag']
+        author = User.objects.get(pk=self.user.pk)
+        author.last_login = timezone.now()
+        author.save(update_fields=['last_login'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_viewers_get_distinct_validators(self):
+        url = self.urls[0]
+        anonymous = self.client.get(url)['ETag']
+        self.client.force_login(self.reader)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], anonymous)
+
+    def test_follow_refreshes_profile_for_follower(self):
+        url = self.urls[2]
+        self.client.force_login(self.reader)
+        etag = self.client.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_resources_are_not_found(self):
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            HTTP_IF_NONE_MATCH='*',
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_page_is_served_from_cache(self):
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        self.assertEqual(first['Surrogate-Key'], 'index')
+        self.assertIn('public', first['Cache-Control'])
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_purge_tagged_pages(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        response = self.client.get(url)
+        self.assertEqual(
+            response['Surrogate-Key'],
+            f'post-{self.post.id} profile-{self.user.id}',
+        )
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Свежий комментарий'
+        )
+        self.assertContains(self.client.get(url), 'Свежий комментарий')
+
+    def test_proxy_keeps_pages_only_when_purged(self):
+        url = reverse('posts:index')
+        self.assertFalse(self.client.get(url).has_header('Surrogate-Control'))
+        cache.clear()
+        with override_settings(PAGE_CACHE_PURGE_URL='http://proxy/purge'):
+            response = self.client.get(url)
+        self.assertEqual(
+            response['Surrogate-Control'],
+            f'max-age={settings.PAGE_CACHE_SURROGATE_MAX_AGE}',
+        )
+
+    @override_settings(PAGE_CACHE_PURGE_URL='http://proxy/purge')
+    def test_bumped_versions_are_purged_from_proxy(self):
+        with mock.patch.object(versions.background, 'submit') as submit:
+            Comment.objects.create(
+                post=self.post, author=self.user, text='Комментарий'
+            )
+        submit.assert_any_call(
+            versions.purge, (versions.post_key(self.post.id),)
+        )
+        with mock.patch.object(versions, 'urlopen') as urlopen:
+            versions.purge([versions.INDEX, versions.post_key(self.post.id)])
+        request = urlopen.call_args[0][0]
+        self.assertEqual(request.full_url, 'http://proxy/purge')
+        self.assertEqual(request.get_method(), 'POST')
+        self.assertEqual(
+            request.get_header('Surrogate-key'), f'index post-{self.post.id}'
+        )
+
+    def test_signed_in_users_bypass_cache(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Surrogate-Key'))
+        self.assertIsNotNone(self.client.get(reverse('posts:index')).context)
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for number in range(12):
+            author = User.objects.create_user(username=f'author{number}')
+            Follow.objects.create(user=cls.reader, author=author)
+            cls.post = Post.objects.create(
+                author=author,
+                text=f'Тестовый пост {number}',
+                group=cls.group,
+            )
+            Comment.objects.create(
+                post=cls.post, author=author, text='Комментарий'
+            )
+        counters.reconcile()
+        timeline.entry_count(cls.reader.pk)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+        buffered = mock.patch.object(
+            pageviews, 'buffered', return_value=True
+        )
+        buffered.start()
+        self.addCleanup(buffered.stop)
+        self.addCleanup(pageviews.take)
+
+    def test_pages_fit_query_budget(self):
+        budgets = {
+            reverse('posts:index'): 5,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 6,
+            reverse(
+                'posts:profile',
+                kwargs={'username': self.post.author.username}
+            ): 7,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}): 7,
+            reverse('posts:comments', kwargs={'post_id': self.post.id}): 4,
+            reverse('posts:follow_index'): 7,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                with self.assertQueryBudget(budget):
+                    self.client.get(url)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Карточка')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def refresh_index(self):
+        versions.bump(versions.INDEX)
+        return self.client.get(reverse('posts:index'))
+
+    def test_feed_reuses_cached_cards(self):
+        response = self.refresh_index()
+        self.assertTemplateUsed(response, 'includes/post.html')
+        response = self.refresh_index()
+        self.assertTemplateNotUsed(response, 'includes/post.html')
+        self.assertContains(response, 'Карточка')
+
+    def test_post_edit_invalidates_card(self):
+        self.refresh_index()
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Исправленная карточка'},
+        )
+        response = self.refresh_index()
+        self.assertTemplateUsed(response, 'includes/post.html')
+        self.assertContains(response, 'Исправленная карточка')
+
+    def test_author_rename_invalidates_card(self):
+        self.refresh_index()
+        self.user.first_name = 'Лев'
+        self.user.last_name = 'Толстой'
+        self.user.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertTemplateUsed(response, 'includes/post.html')
+        self.assertContains(response, 'Автор: Лев Толстой')
+
+    def test_login_keeps_cached_card(self):
+        self.refresh_index()
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        response = self.refresh_index()
+        self.assertTemplateNotUsed(response, 'includes/post.html')
@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверка, что блок кода укладывается в бюджет SQL-запросов.
+
+    Кэш очищается перед замером: бюджет считается для холодной
+    отрисовки, когда ни фрагменты, ни карточки, ни результаты запросов
+    ещё не закэшированы.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(
+                    context.captured_queries, start=1
+                )
+            )
+            self.fail(
+                f'Выполнено {executed} запросов при бюджете {budget}:\n'
+                f'{queries}'
+            )
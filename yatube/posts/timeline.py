@@ -0,0 +1,210 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import CharField, Count, F, Value
+from django.db.models.functions import Cast, Concat
+
+from . import counters
+from .models import Counter, Follow, Post, TimelineEntry
+
+BATCH_SIZE = 500
+
+COUNT_PREFIX = 'timeline:count:'
+
+
+def read_mode_key(author_id):
+    return f'timeline:read:{author_id}'
+
+
+def count_key(user_id):
+    return f'{COUNT_PREFIX}{user_id}'
+
+
+def _count_keys(user_ids):
+    """Подзапрос ключей счётчиков лент для подзапроса ``user_ids``."""
+    return user_ids.annotate(
+        count_key=Concat(
+            Value(COUNT_PREFIX), Cast('user_id', CharField()),
+            output_field=CharField(),
+        )
+    ).values('count_key')
+
+
+def _change_counts(user_ids, delta):
+    Counter.objects.filter(key__in=_count_keys(user_ids)).update(
+        value=F('value') + delta
+    )
+
+
+def entry_count(user_id):
+    return counters.get_count(
+        count_key(user_id), TimelineEntry.objects.filter(user_id=user_id)
+    )
+
+
+def is_read_mode(author_id):
+    """Проверить, раздаются ли посты автора при чтении ленты.
+
+    Автор с числом подписчиков выше ``TIMELINE_FANOUT_THRESHOLD``
+    переводится в этот режим навсегда: его новые посты не копируются
+    в ленты подписчиков, а подмешиваются при чтении. Уже разложенные
+    посты при переводе удаляются из лент, чтобы объединение при чтении
+    не считало их дважды; счётчики этих лент пересчитаются заново.
+    """
+    key = read_mode_key(author_id)
+    if Counter.objects.filter(key=key).exists():
+        return True
+    threshold = settings.TIMELINE_FANOUT_THRESHOLD
+    if counters.follower_count(author_id) <= threshold:
+        return False
+    _, created = Counter.objects.get_or_create(
+        key=key, defaults={'value': 1}
+    )
+    if created:
+        entries = TimelineEntry.objects.filter(post__author_id=author_id)
+        Counter.objects.filter(
+            key__in=_count_keys(entries.values('user_id').distinct())
+        ).delete()
+        entries.delete()
+    return True
+
+
+def fan_out(post):
+    if is_read_mode(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    _change_counts(Follow.objects.filter(author_id=post.author_id), 1)
+
+
+def backfill(user_id, author_id):
+    if is_read_mode(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date'
+    ).order_by()
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    before = entries.filter(post__author_id=author_id).count()
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=date)
+            for post_id, date in posts.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    added = entries.filter(post__author_id=author_id).count() - before
+    if added:
+        counters.change(count_key(user_id), added)
+
+
+def prune(user_id, author_id):
+    deleted, _ = TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+    if deleted:
+        counters.change(count_key(user_id), -deleted)
+
+
+def discard(post_id):
+    """Уменьшить счётчики лент, из которых удаляется пост.
+
+    Вызывается до удаления: строки лент уходят каскадом вместе
+    с постом.
+    """
+    _change_counts(TimelineEntry.objects.filter(post_id=post_id), -1)
+
+
+def read_mode_authors(user):
+    followed = Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    )
+    keys = [read_mode_key(author_id) for author_id in followed]
+    if not keys:
+        return []
+    return [
+        int(key.rsplit(':', 1)[1])
+        for key in Counter.objects.filter(key__in=keys).values_list(
+            'key', flat=True
+        )
+    ]
+
+
+def follow_feed(user):
+    """Вернуть ленту подписок, порядок её сортировки и счётчик.
+
+    Обычно лента читается одним диапазоном индекса
+    ``(user, -pub_date, -post)`` материализованной таблицы. Если среди
+    подписок есть авторы в режиме чтения, их посты объединяются
+    с материализованными по дате публикации. Число постов берётся
+    из счётчиков ленты и авторов, без ``COUNT(*)`` по ленте.
+    """
+    authors = read_mode_authors(user)
+    if not authors:
+        queryset = Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_post=F('timeline_entries__post'),
+        )
+        return (
+            queryset, ('-feed_date', '-feed_post'),
+            lambda: entry_count(user.pk),
+        )
+    queryset = Post.objects.filter(
+        id__in=TimelineEntry.objects.filter(user=user).values('post')
+    ) | Post.objects.filter(author_id__in=authors)
+
+    def count():
+        return entry_count(user.pk) + sum(
+            counters.get_count(
+                counters.author_posts_key(author_id),
+                Post.objects.filter(author_id=author_id),
+            )
+            for author_id in authors
+        )
+
+    return queryset, ('-pub_date', '-id'), count
+
+
+def rebuild():
+    """Пересобрать все ленты подписок одним INSERT ... SELECT.
+
+    Нужна после массовой загрузки через ``bulk_create``, которая не
+    вызывает сигналы. Счётчики подписчиков должны быть уже пересчитаны:
+    по ним авторы переводятся в режим чтения.
+    """
+    threshold = settings.TIMELINE_FANOUT_THRESHOLD
+    heavy = list(
+        Follow.objects.values('author').annotate(
+            followers=Count('id')
+        ).filter(followers__gt=threshold).values_list('author', flat=True)
+    )
+    Counter.objects.bulk_create(
+        (Counter(key=read_mode_key(author_id), value=1)
+         for author_id in heavy),
+        ignore_conflicts=True,
+    )
+    TimelineEntry.objects.all().delete()
+    Counter.objects.filter(key__startswith=COUNT_PREFIX).delete()
+    condition = ''
+    if heavy:
+        placeholders = ', '.join(['%s'] * len(heavy))
+        condition = f'WHERE follow.author_id NOT IN ({placeholders})'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            '(user_id, post_id, pub_date) '
+            'SELECT follow.user_id, post.id, post.pub_date '
+            f'FROM {Follow._meta.db_table} follow '
+            f'JOIN {Post._meta.db_table} post '
+            f'ON post.author_id = follow.author_id {condition}',
+            heavy,
+        )
@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import versions
+from .models import Comment, Follow, Post, TrendingPost
+
+BATCH_SIZE = 500
+
+
+def _lookup(keys, values, targets):
+    """Значения ``values`` по ключам ``targets``; нет ключа — ноль.
+
+    ``keys`` отсортированы, поэтому сопоставление — один
+    ``searchsorted`` без цикла по строкам.
+    """
+    result = np.zeros(len(targets), dtype=np.float64)
+    if not len(keys):
+        return result
+    positions = np.searchsorted(keys, targets).clip(max=len(keys) - 1)
+    found = keys[positions] == targets
+    result[found] = values[positions[found]]
+    return result
+
+
+def _grouped(queryset, field):
+    rows = np.array(
+        queryset.values(field).annotate(num=Count('id')).values_list(
+            field, 'num'
+        ).order_by(field),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    return rows[:, 0], rows[:, 1]
+
+
+def candidates(since):
+    """Посты окна в виде столбцов: id, автор, время публикации, просмотры."""
+    rows = list(Post.objects.filter(pub_date__gte=since).order_by(
+        'id'
+    ).values_list('id', 'author_id', 'views', 'pub_date'))
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty.astype(np.float64), empty
+    ids, authors, views, dates = zip(*rows)
+    published = np.fromiter(
+        (date.timestamp() for date in dates), np.float64, len(dates)
+    )
+    return (
+        np.array(ids, dtype=np.int64),
+        np.array(authors, dtype=np.int64),
+        published,
+        np.array(views, dtype=np.int64),
+    )
+
+
+def scores(now, published, views, velocity, gained):
+    """Оценки постов одним векторным выражением.
+
+    Числитель складывает свежие комментарии, подписчиков, набранных
+    автором, и логарифм просмотров; знаменатель — возраст в часах
+    в степени ``TRENDING_GRAVITY``, так что старые посты опускаются.
+    """
+    weights = settings.TRENDING_WEIGHTS
+    age = np.maximum(now.timestamp() - published, 0) / 3600
+    numerator = (
+        1
+        + weights['comments'] * velocity
+        + weights['follows'] * np.log1p(gained)
+        + weights['views'] * np.log1p(views)
+    )
+    return numerator / (age + 2) ** settings.TRENDING_GRAVITY
+
+
+def compute(now=None):
+    """Пересчитать рейтинг популярного и сохранить лучшие посты."""
+    now = now or timezone.now()
+    since = now - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    recent = now - timedelta(hours=settings.TRENDING_VELOCITY_HOURS)
+    ids, authors, published, views = candidates(since)
+    comment_posts, comment_counts = _grouped(
+        Comment.objects.filter(
+            created__gte=recent, post__pub_date__gte=since
+        ),
+        'post',
+    )
+    follow_authors, follow_counts = _grouped(
+        Follow.objects.filter(created__gte=recent), 'author'
+    )
+    score = scores(
+        now, published, views,
+        velocity=_lookup(comment_posts, comment_counts, ids),
+        gained=_lookup(follow_authors, follow_counts, authors),
+    )
+    order = np.lexsort((-ids, -score))[:settings.TRENDING_SIZE]
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(
+            (
+                TrendingPost(post_id=post_id, rank=rank, score=value)
+                for rank, (post_id, value) in enumerate(
+                    zip(ids[order].tolist(), score[order].tolist()), start=1
+                )
+            ),
+            batch_size=BATCH_SIZE,
+        )
+    versions.bump(versions.TRENDING)
+    return len(ids), len(order)
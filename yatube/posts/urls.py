@@ -7,9 +7,15 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('trending/', views.trending, name='trending'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='comments'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -17,6 +23,7 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path('search/', views.search, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -0,0 +1,92 @@
+import logging
+import time
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import background
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'version:'
+
+INDEX = 'version:index'
+
+TRENDING = 'version:trending'
+
+
+def group_key(group_id):
+    return f'version:group:{group_id}'
+
+
+def profile_key(author_id):
+    return f'version:profile:{author_id}'
+
+
+def follow_key(user_id):
+    return f'version:follow:{user_id}'
+
+
+def post_key(post_id):
+    return f'version:post:{post_id}'
+
+
+def feed_keys(author_id, group_id):
+    """Версии лент, где может стоять пост автора из группы."""
+    keys = [INDEX, TRENDING, profile_key(author_id)]
+    if group_id is not None:
+        keys.append(group_key(group_id))
+    return keys
+
+
+def _stamp():
+    return time.time_ns() // 1000
+
+
+def get_versions(*keys):
+    """Вернуть версии ресурсов в порядке ключей.
+
+    Версия — отметка времени последнего изменения в микросекундах.
+    Потерянная кешем версия заводится заново текущим временем, так что
+    зависящие от неё фрагменты просто перестают находиться.
+    """
+    versions = cache.get_many(keys)
+    missing = {key: _stamp() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def surrogate_names(keys):
+    """Имена версий для заголовка ``Surrogate-Key``."""
+    return ' '.join(
+        key[len(PREFIX):].replace(':', '-') for key in keys
+    )
+
+
+def purge(keys):
+    """Попросить внешний прокси забыть страницы с этими версиями."""
+    request = Request(
+        settings.PAGE_CACHE_PURGE_URL,
+        method='POST',
+        headers={'Surrogate-Key': surrogate_names(keys)},
+    )
+    try:
+        with urlopen(request, timeout=settings.PAGE_CACHE_PURGE_TIMEOUT):
+            pass
+    except OSError:
+        logger.warning('Не удалось очистить прокси: %s', keys, exc_info=True)
+
+
+def bump(*keys):
+    """Сменить версии ресурсов.
+
+    Если задан ``PAGE_CACHE_PURGE_URL``, после фиксации транзакции
+    прокси получает имена сменённых версий и очищает свои копии.
+    """
+    stamp = _stamp()
+    cache.set_many({key: stamp for key in keys}, None)
+    if keys and settings.PAGE_CACHE_PURGE_URL:
+        background.submit(purge, keys)
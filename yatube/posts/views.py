@@ -1,30 +1,75 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db.models import F
 from django.shortcuts import render, redirect, get_object_or_404
+from django.views.decorators.vary import vary_on_cookie
 
-from .models import Post, Group, User, Comment, Follow
-from .forms import PostForm, CommentForm
+from core.paginator import CursorPaginator
+from core.replicas import replica_reads
+from .counters import post_count, post_count_provider
+from .models import Post, Group, User, Comment, Follow, TrendingPost
+from .forms import PostForm, CommentForm, SearchForm
+from .search import search as search_posts
+from .timeline import follow_feed
+from . import conditional, related, suggestions, versions
 
 
 POSTS_PER_PAGE = 10
 
+COMMENTS_PER_PAGE = 20
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, POSTS_PER_PAGE)
+
+def get_page_context(queryset, request, count=None,
+                     ordering=('-pub_date', '-id'), version_keys=(),
+                     estimated=False):
+    paginator = CursorPaginator(
+        queryset,
+        POSTS_PER_PAGE,
+        ordering=ordering,
+        count=count,
+        estimated=estimated
+    )
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        page_obj = paginator.get_cursor_page(cursor)
+    else:
+        page_obj = paginator.get_page(page_number)
+    feed_key = [*versions.get_versions(*version_keys), page_number, cursor]
     return {
         'page_number': page_number,
         'page_obj': page_obj,
+        'feed_key': ':'.join(map(str, feed_key)),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
 
 
+def get_comments_page(post, cursor=None):
+    paginator = CursorPaginator(
+        Comment.objects.for_post(post),
+        COMMENTS_PER_PAGE,
+        ordering=('created', 'id'),
+        count=lambda: post.comments_count
+    )
+    if cursor:
+        return paginator.get_cursor_page(cursor)
+    return paginator.page(1)
+
+
+@replica_reads
+@vary_on_cookie
+@conditional.conditional(conditional.index_keys)
 def index(request):
     title = 'Последние обновления на сайте'
     context = {
         'title': title,
     }
-    context.update(get_page_context(Post.objects.all(), request))
+    context.update(get_page_context(
+        Post.objects.for_feed().cached(),
+        request,
+        count=post_count_provider(),
+        version_keys=(versions.INDEX,)
+    ))
     return render(
         request,
         'posts/index.html',
@@ -32,12 +77,20 @@ def index(request):
     )
 
 
+@replica_reads
+@vary_on_cookie
+@conditional.conditional(conditional.group_keys)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     context = {
         'group': group,
     }
-    context.update(get_page_context(group.posts.all(), request))
+    context.update(get_page_context(
+        group.posts.for_feed().cached(),
+        request,
+        count=post_count_provider(group=group),
+        version_keys=(versions.group_key(group.pk),)
+    ))
     return render(
         request,
         'posts/group_list.html',
@@ -45,11 +98,16 @@ def group_posts(request, slug):
     )
 
 
+@replica_reads
+@vary_on_cookie
+@conditional.conditional(conditional.profile_keys)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts_num = author.posts.count()
+    posts_num = post_count(author=author)
+    own = request.user == author
     following = (
         request.user.is_authenticated
+        and not own
         and Follow.objects.filter(
             user=request.user,
             author=author
@@ -59,8 +117,14 @@ def profile(request, username):
         'author': author,
         'posts_num': posts_num,
         'following': following,
+        'suggestions': suggestions.for_user(request.user) if own else [],
     }
-    context.update(get_page_context(author.posts.all(), request))
+    context.update(get_page_context(
+        author.posts.for_feed().cached(),
+        request,
+        count=lambda: posts_num,
+        version_keys=(versions.profile_key(author.pk),)
+    ))
     return render(
         request,
         'posts/profile.html',
@@ -68,10 +132,16 @@ def profile(request, username):
     )
 
 
+@replica_reads
+@vary_on_cookie
+@conditional.conditional(conditional.post_keys)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = Comment.objects.filter(post=post)
-    posts_num = post.author.posts.count()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'),
+        id=post_id
+    )
+    comments = get_comments_page(post)
+    posts_num = post_count(author=post.author)
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
@@ -79,6 +149,7 @@ def post_detail(request, post_id):
         'post_id': post_id,
         'form': form,
         'comments': comments,
+        'related_posts': related.for_post(post_id),
     }
     return render(
         request,
@@ -87,6 +158,44 @@ def post_detail(request, post_id):
     )
 
 
+@vary_on_cookie
+@conditional.conditional(conditional.comment_keys)
+def post_comments(request, post_id):
+    post = get_object_or_404(
+        Post.objects.only('comments_count', 'author', 'group'),
+        id=post_id
+    )
+    context = {
+        'post_id': post_id,
+        'comments': get_comments_page(post, request.GET.get('cursor')),
+    }
+    return render(request, 'includes/comments.html', context)
+
+
+@replica_reads
+@vary_on_cookie
+@conditional.conditional(conditional.trending_keys)
+def trending(request):
+    context = {
+        'title': 'Популярное',
+        'trending': True,
+    }
+    context.update(get_page_context(
+        Post.objects.for_feed().filter(trending__isnull=False).annotate(
+            trending_rank=F('trending__rank')
+        ).cached(),
+        request,
+        count=TrendingPost.objects.count,
+        ordering=('trending_rank',),
+        version_keys=(versions.TRENDING,)
+    ))
+    return render(
+        request,
+        'posts/trending.html',
+        context
+    )
+
+
 @login_required
 def post_create(request):
     title = 'Новый пост'
@@ -149,15 +258,52 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def search(request):
+    form = SearchForm(request.GET or None)
+    context = {
+        'form': form,
+        'query': '',
+    }
+    if form.is_valid() and form.cleaned_data['q']:
+        queryset = Post.objects.for_feed()
+        if form.cleaned_data['group'] is not None:
+            queryset = queryset.filter(group=form.cleaned_data['group'])
+        if form.cleaned_data['author']:
+            queryset = queryset.filter(
+                author__username=form.cleaned_data['author']
+            )
+        queryset, ordering = search_posts(form.cleaned_data['q'], queryset)
+        params = request.GET.copy()
+        params.pop('page', None)
+        params.pop('cursor', None)
+        context['query'] = form.cleaned_data['q']
+        context['page_query'] = params.urlencode() + '&'
+        context.update(get_page_context(
+            queryset, request, ordering=ordering, estimated=True
+        ))
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@replica_reads
+@vary_on_cookie
+@conditional.conditional(conditional.follow_keys)
 def follow_index(request):
     title = 'Поcты избранных авторов'
     context = {
         'title': title,
+        'suggestions': suggestions.for_user(request.user),
     }
+    queryset, ordering, count = follow_feed(request.user)
     context.update(get_page_context(
-        Post.objects.filter(author__following__user=request.user),
-        request
+        queryset.for_feed(),
+        request,
+        count=count,
+        ordering=ordering,
+        version_keys=(
+            versions.INDEX,
+            versions.follow_key(request.user.pk),
+        )
     ))
     return render(
         request,
@@ -1,4 +1,5 @@
 import os
+import sys
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -15,12 +16,60 @@ ALLOWED_HOSTS = [
     'testserver',
 ]
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+# Версии и шина инвалидаций должны доходить до всех воркеров, поэтому
+# по умолчанию кеш общий; кеш в памяти процесса — только для тестов.
+CACHE_BACKEND = os.getenv(
+    'YATUBE_CACHE', 'locmem' if TESTING else 'sqlite'
+)
+
+CACHE_TTL_POLICIES = {
+    'version:': None,
+    'post-card:': 60 * 60 * 24,
+    'bus:': 60 * 5,
+    'bus:sequence': None,
+}
+
+SHARED_CACHES = {
+    'sqlite': {
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'TTL_POLICIES': CACHE_TTL_POLICIES,
+        },
+    },
+    'redis': {
+        'BACKEND': 'core.cache.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+        'OPTIONS': {
+            'TTL_POLICIES': CACHE_TTL_POLICIES,
+        },
+    },
 }
 
+if CACHE_BACKEND in SHARED_CACHES:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.tiered.TieredCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {
+                'LOCAL_TIMEOUT': 5,
+                'BUS_POLL_INTERVAL': 1,
+            },
+        },
+        'shared': SHARED_CACHES[CACHE_BACKEND],
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 INSTALLED_APPS = [
@@ -38,7 +87,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.PostViewCountMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -68,13 +121,51 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
+}
+
+CONN_MAX_AGE = int(os.getenv('YATUBE_CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+            'busy_retries': 5,
+        },
     }
 }
 
+REPLICA_DATABASES = []
+
+for number, path in enumerate(filter(None, os.getenv(
+    'YATUBE_REPLICAS', ''
+).split(','))):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'core.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'OPTIONS': {
+            'pragmas': {**SQLITE_PRAGMAS, 'query_only': 1},
+            'busy_retries': 5,
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+REPLICA_PIN_SECONDS = int(os.getenv('YATUBE_REPLICA_PIN_SECONDS', 10))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,3 +208,87 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+TIMELINE_FANOUT_THRESHOLD = 10000
+
+FEED_CACHE_TIMEOUT = 60 * 15
+
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+QUERY_CACHE_TIMEOUT = 60 * 5
+
+TRENDING_WINDOW_DAYS = 7
+
+TRENDING_VELOCITY_HOURS = 24
+
+TRENDING_SIZE = 1000
+
+TRENDING_GRAVITY = 1.5
+
+TRENDING_WEIGHTS = {'comments': 1.0, 'follows': 2.0, 'views': 0.5}
+
+FOLLOW_SUGGESTIONS_SIZE = 20
+
+FOLLOW_SUGGESTIONS_SHOWN = 5
+
+FOLLOW_SUGGESTIONS_PEERS = 50
+
+FOLLOW_SUGGESTIONS_HUB_LIMIT = 1000
+
+FOLLOW_SUGGESTIONS_WEIGHTS = {'friends': 1.0, 'cofollow': 0.5}
+
+RELATED_POSTS_SIZE = 10
+
+RELATED_POSTS_SHOWN = 5
+
+RELATED_POSTS_MAX_DF = 0.5
+
+RELATED_POSTS_POSTINGS_LIMIT = 1000
+
+VIEW_COUNTS_FLUSH_INTERVAL = int(
+    os.getenv('YATUBE_VIEW_COUNTS_FLUSH_INTERVAL', 30)
+)
+
+# Пользователи не кешируются: в строках auth_user хеши паролей.
+QUERY_CACHE_MODELS = (
+    'posts.Group', 'posts.Follow', 'posts.FollowSuggestion',
+)
+
+# Кеш запросов в памяти процесса годится только для одного процесса,
+# как у сервера разработки.
+QUERY_CACHE_ALLOW_LOCAL = DEBUG
+
+BACKGROUND_WORKERS = int(os.getenv('YATUBE_BACKGROUND_WORKERS', 2))
+
+POST_THUMBNAIL_GEOMETRY = '960x339'
+
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP')
+
+POST_IMAGE_SIZES = '(max-width: 992px) 100vw, 960px'
+
+PAGE_CACHE_TIMEOUT = 60 * 15
+
+PAGE_CACHE_SURROGATE_MAX_AGE = 60 * 60 * 24
+
+# Адрес очистки внешнего прокси по Surrogate-Key; пока он не задан,
+# прокси не разрешено хранить страницы дольше, чем их проверять.
+PAGE_CACHE_PURGE_URL = os.getenv('YATUBE_PAGE_CACHE_PURGE_URL', '')
+
+PAGE_CACHE_PURGE_TIMEOUT = 2
+
+INTERNAL_IPS = list(filter(None, os.getenv(
+    'YATUBE_INTERNAL_IPS', ''
+).split(',')))
+
+SERVER_TIMING_SAMPLE_RATE = float(
+    os.getenv('YATUBE_TIMING_SAMPLE_RATE', 0.1)
+)
+
+# Общий для воркеров файл метрик; пустое значение отключает метрики.
+METRICS_FILE = os.getenv('YATUBE_METRICS_FILE', '')
+
+METRICS_TOKEN = os.getenv('YATUBE_METRICS_TOKEN', '')
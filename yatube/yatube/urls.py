@@ -3,6 +3,8 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import metrics
+
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
@@ -10,6 +12,7 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('metrics', metrics, name='metrics'),
 ]
 
 handler404 = 'core.views.page_not_found'